@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.application.services.auth_service import AuthService
-from app.infrastructure.persistence.user_repository import UserRepository
-from app.domain.entities.user import User
+from app.application.services.jwt_service import JWTService
+from app.core.dependencies import get_adapters, get_current_user
+from app.infrastructure.adapters.registry import AdapterRegistry
+from app.infrastructure.persistence.user_repository import AsyncUserRepository
+from app.domain.entities.user import User, Token
 
 router = APIRouter()
 
@@ -12,22 +15,31 @@ class UserAuth(BaseModel):
     username: str
     password: str
 
-def get_auth_service(db: Session = Depends(get_db)):
-    user_repo = UserRepository(db)
-    return AuthService(user_repo)
+def get_auth_service(db: AsyncSession = Depends(get_async_db), adapters: AdapterRegistry = Depends(get_adapters)):
+    user_repo = AsyncUserRepository(db)
+    return AuthService(user_repo, JWTService(), adapters.auth_executor, adapters.principals)
 
 @router.post("/resigster", response_model = User, status_code = status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     user_in: UserAuth,
     auth_service: AuthService = Depends(get_auth_service)
 ):  
-    """Register a new user and return the user object with a JWT."""
-    return auth_service.register_user(user_in.username, user_in.password)
+    """Register a new user and return the user object."""
+    return await auth_service.register_user(user_in.username, user_in.password)
 
-@router.post("/login", response_model = User)
-def login_user(
+@router.post("/login", response_model = Token)
+async def login_user(
     user_in: UserAuth,
     auth_service: AuthService = Depends(get_auth_service)
 ):
     """Log in an existing user and return the user object with a JWT."""
-    return auth_service.authenticate_user(user_in.username, user_in.password) 
\ No newline at end of file
+    return await auth_service.authenticate_user(user_in.username, user_in.password)
+
+@router.post("/deactivate", status_code = status.HTTP_204_NO_CONTENT)
+async def deactivate_user(
+    current_user: User = Depends(get_current_user),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    """Deactivate the current user's account; its tokens stop working right away."""
+    await auth_service.set_user_active(current_user.id, False)
+    return Response(status_code = status.HTTP_204_NO_CONTENT)
@@ -1,62 +1,231 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Query, status
-from fastapi.responses import FileResponse, RedirectResponse 
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from app.core.database import get_db
-from app.core.exceptions import ImageNotFoundError
-from app.core.dependencies import get_current_user
-from app.domain.entities.image import Image, Transformation
+import mimetypes
+import os
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, Query, status
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from app.core.database import get_async_db
+from app.core.config import settings
+from app.core.exceptions import ImageNotFoundError, UploadTooLargeError
+from app.core.dependencies import get_current_user, get_adapters
+from app.domain.entities.image import Image, ImagePage, JobStatus, Transformation, UploadedImage, BatchTransformationRequest, BatchTransformationResult, AUTO_FORMAT, ENCODER_PRESETS
 from app.domain.entities.user import User
 from app.application.services.image_service import ImageService
-from app.infrastructure.persistence.image_repository import ImageRepository
-from app.infrastructure.adapters.storage_service import GoogleCloudStorageService 
-from app.infrastructure.adapters.message_queue import KafkaProducerAdapter
-from app.infrastructure.adapters.redis_adapter import RedisAdapter # NEW Import
+from app.application.services.render_service import RenderService
+from app.infrastructure.persistence.image_repository import AsyncImageRepository
+from app.infrastructure.adapters.registry import AdapterRegistry
+from app.infrastructure.adapters.local_storage import LocalFileStorageService
 
 router = APIRouter()
 
-def get_image_service(db: Session = Depends(get_db)):
-    repo = ImageRepository(db)
-    storage = GoogleCloudStorageService() 
-    producer = KafkaProducerAdapter()
-    redis_adapter = RedisAdapter() 
-    return ImageService(repo, storage, producer, redis_adapter)
+def get_image_service(db: AsyncSession = Depends(get_async_db), adapters: AdapterRegistry = Depends(get_adapters)):
+    # Adapters are shared process-wide (see the lifespan in app/main.py); only the repository is per-request
+    repo = AsyncImageRepository(db)
+    return ImageService(
+        repo, adapters.storage_io, adapters.queue_io, adapters.redis,
+        url_cache=adapters.url_cache, owner_cache=adapters.owner_cache, url_flights=adapters.url_flights,
+        url_load_flights=adapters.url_load_flights,
+        signing_pool=adapters.signing_pool, jobs=adapters.jobs
+    )
 
 
-@router.post("/", response_model=Image, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=UploadedImage, status_code=status.HTTP_201_CREATED)
 async def upload_image(
     file: UploadFile = File(...),
+    variants: Optional[str] = Query(None, description="Variant profile to render right away, or `none`; defaults to DEFAULT_VARIANT_PROFILE."),
     current_user: User = Depends(get_current_user),
     image_service: ImageService = Depends(get_image_service)
 ):
-    """Upload an image and return its details."""
+    """
+    Upload an image and return its details, including the derivative id of each
+    width of the variant profile queued with it.
+    """
     # Basic validation
     if file.content_type not in ["image/jpeg", "image/png", "image/webp", "image/gif"]:
-        raise status.HTTP_400_BAD_REQUEST("Invalid image format.")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image format.")
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE_BYTES:
+        raise UploadTooLargeError()
+
+    profile = settings.DEFAULT_VARIANT_PROFILE if variants is None else variants
+    if profile == "none":
+        profile = None
+    if profile is not None and profile not in settings.VARIANT_PROFILES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown variant profile '{profile}'.")
         
-    uploaded_image = await image_service.upload_image(file, current_user.id)
+    uploaded_image = await image_service.upload_image(file, current_user.id, profile)
     return uploaded_image
 
 @router.post("/{image_id}/transform", response_model=Image)
 async def apply_transformations(
     image_id: str,
     transformations: Transformation,
+    accept: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     image_service: ImageService = Depends(get_image_service)
 ):
     """
     Applies transformations to an image and triggers asynchronous processing.
-    Returns the placeholder image details.
+    Returns the placeholder image details. With "format": "auto" the format is picked
+    from the Accept header, which should be that of the client displaying the image.
     """
-    transformed_image = image_service.request_transformation(
+    transformed_image = await image_service.request_transformation(
         image_id, 
         current_user.id, 
-        transformations
+        transformations,
+        accept
     )
     return transformed_image
 
+@router.post("/transform/batch", response_model=List[BatchTransformationResult])
+async def apply_transformations_batch(
+    batch: BatchTransformationRequest,
+    accept: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service)
+):
+    """
+    Applies every transformation to every listed image and triggers asynchronous processing.
+    Returns one result per (image, transformation) pair.
+    """
+    if len(batch.image_ids) * len(batch.transformations) > settings.MAX_BATCH_TRANSFORMATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may request at most {settings.MAX_BATCH_TRANSFORMATIONS} derivatives."
+        )
+    return await image_service.request_transformations_batch(
+        batch.image_ids,
+        current_user.id,
+        batch.transformations,
+        accept
+    )
+
+@router.get("/{image_id}/status", response_model=JobStatus)
+async def get_transformation_status(
+    image_id: str,
+    wait: int = Query(0, ge=0, le=settings.JOB_STATUS_MAX_WAIT_SECONDS, description="Seconds to wait for the job to finish."),
+    current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service)
+):
+    """
+    State of the transformation producing `image_id` (queued, processing, done or failed).
+    With `wait`, the request is held until the job finishes or the wait runs out (long poll).
+    """
+    return await image_service.wait_for_job(image_id, current_user.id, wait)
+
+@router.get("/{image_id}/events")
+async def stream_transformation_status(
+    image_id: str,
+    current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service)
+):
+    """
+    Server-Sent Events stream of the transformation's state: the current state first,
+    then each change. The stream ends once the job is done or failed.
+    """
+    events = await image_service.job_events(image_id, current_user.id)
+
+    async def stream():
+        async for job in events:
+            if job is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: status\ndata: {job.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def get_render_service(db: AsyncSession = Depends(get_async_db), adapters: AdapterRegistry = Depends(get_adapters)):
+    return RenderService(
+        AsyncImageRepository(db),
+        adapters.storage_io,
+        adapters.redis,
+        adapters.render_cache,
+        adapters.render_flights,
+        adapters.render_executor
+    )
+
+def get_render_transformation(
+    w: Optional[int] = Query(None, ge=1),
+    h: Optional[int] = Query(None, ge=1),
+    rotate: Optional[int] = Query(None),
+    flip: bool = Query(False),
+    mirror: bool = Query(False),
+    grayscale: bool = Query(False),
+    format: Optional[str] = Query(None, pattern="(?i)^(jpe?g|png|webp|avif|auto)$"),
+    quality: Optional[int] = Query(None, ge=1, le=100),
+    preset: Optional[str] = Query(None, pattern=f"(?i)^({'|'.join(ENCODER_PRESETS)})$")
+) -> Transformation:
+    """Maps URL query parameters onto a Transformation."""
+    return Transformation(
+        # Either side alone keeps the aspect ratio
+        resize={side: size for side, size in (("width", w), ("height", h)) if size} or None,
+        rotate=rotate,
+        flip=flip,
+        mirror=mirror,
+        filters={"grayscale": True} if grayscale else None,
+        format=format,
+        compress_quality=quality,
+        preset=preset
+    )
+
+@router.get("/{image_id}/render")
+async def render_image(
+    image_id: str,
+    transformation: Transformation = Depends(get_render_transformation),
+    accept: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    render_service: RenderService = Depends(get_render_service)
+):
+    """
+    Renders a small transformation synchronously and returns the image bytes,
+    e.g. /images/{id}/render?w=64&h=64&format=webp. Served from cache when possible;
+    transformations too large to render inline are rejected with 422.
+    format=auto picks AVIF, WebP or JPEG/PNG from the Accept header.
+    """
+    content, rendered = await render_service.render(image_id, current_user.id, transformation, accept)
+    media_type = f"image/{rendered.canonical()['format'].lower()}"
+    headers = {
+        "Cache-Control": f"private, max-age={settings.RENDER_CACHE_TTL_SECONDS}",
+        "ETag": f'"{rendered.fingerprint()}"'
+    }
+    if transformation.format == AUTO_FORMAT:
+        # The same URL returns different formats to different clients
+        headers["Vary"] = "Accept"
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@router.get("/files/{storage_url:path}")
+def serve_local_file(
+    storage_url: str,
+    expires: int = Query(...),
+    signature: str = Query(...),
+    adapters: AdapterRegistry = Depends(get_adapters)
+):
+    """
+    Serves a file from the local storage backend for a URL produced by its
+    generate_signed_url. The signature replaces authentication, like a GCS Signed URL.
+    FileResponse streams from disk and honours HTTP Range requests.
+    """
+    storage = adapters.storage
+    if not isinstance(storage, LocalFileStorageService) or not storage.verify_signature(storage_url, expires, signature):
+        raise ImageNotFoundError()
+
+    path = storage.local_path(storage_url)
+    if not os.path.exists(path):
+        raise ImageNotFoundError()
+
+    media_type = mimetypes.guess_type(storage_url)[0] or "application/octet-stream"
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={"Cache-Control": f"private, max-age={max(0, expires - int(time.time()))}"}
+    )
+
 @router.get("/{image_id}")
-def retrieve_image(
+async def retrieve_image(
     image_id: str,
     current_user: User = Depends(get_current_user),
     image_service: ImageService = Depends(get_image_service)
@@ -66,21 +235,26 @@ def retrieve_image(
     Returns a 307 Redirect to a time-limited GCS Signed URL for direct download.
     """
     try:
-        signed_url = image_service.get_image_url(image_id, current_user.id)
+        signed_url = await image_service.get_image_url(image_id, current_user.id)
         return RedirectResponse(url=signed_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
-    except ImageNotFoundError:
-        raise ImageNotFoundError()
+    except HTTPException:
+        # Not found, or the signing executor is saturated (503)
+        raise
     except Exception as e:
-        print(f"Error retrieving signed URL: {e}")
-        raise status.HTTP_500_INTERNAL_SERVER_ERROR(detail="Could not generate external image URL due to internal error.")
+        print(f"Error retrieving signed URL for image {image_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not generate external image URL due to internal error."
+        )
 
 
-@router.get("/", response_model=List[Image])
-def list_images(
-    page: int = Query(1, ge=1), 
+@router.get("/", response_model=ImagePage)
+async def list_images(
+    cursor: Optional[str] = Query(None, description="`next_cursor` from the previous page."),
     limit: int = Query(10, ge=1, le=50),
+    include_urls: bool = Query(False, description="Also return a signed URL for every image on the page."),
     current_user: User = Depends(get_current_user),
     image_service: ImageService = Depends(get_image_service)
 ):
-    """Get a paginated list of images uploaded by the user."""
-    return image_service.list_user_images(current_user.id, page, limit)
\ No newline at end of file
+    """Get a page of images uploaded by the user, newest first."""
+    return await image_service.list_user_images(current_user.id, limit, cursor, include_urls)
\ No newline at end of file
@@ -1,77 +1,97 @@
+import asyncio
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from datetime import timedelta # Keep for token expiration calculation if needed later
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+from app.domain.entities.user import User
 
-# Import the SQLAlchemy ORM Model (Assuming this is correct from previous step)
-from app.infrastructure.database.models import UserDB 
-# Assuming UserDB is the ORM model defined elsewhere
-
-# Configuration for password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Configuration for password hashing. Hashes with any other cost are rehashed on the
+# next successful login, so AUTH_BCRYPT_ROUNDS can be tuned in both directions.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.AUTH_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.AUTH_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.AUTH_BCRYPT_ROUNDS,
+)
 
 
 class AuthService:
     """Handles authentication and authorization business logic."""
-    # Now correctly requires two dependencies
-    def __init__(self, user_repo, jwt_service):
+    # Requires the user repository, the JWT service and the bounded hashing pool
+    def __init__(self, user_repo, jwt_service, hasher: BoundedExecutor, principals=None):
         self.user_repo = user_repo
         self.jwt_service = jwt_service # Storing the injected JWT Service
+        # bcrypt runs on its own bounded pool, never on the threadpool shared with the image API
+        self.hasher = hasher
+        self.principals = principals # PrincipalCache of verified tokens, invalidated on deactivation
 
     # --- Utility Methods ---
 
-    def _hash_password(self, password: str) -> str:
+    @staticmethod
+    def _password_bytes(password: str) -> bytes:
+        # bcrypt only uses the first 72 bytes
+        return password.encode('utf-8')[:72]
+
+    async def _hash_password(self, password: str) -> str:
         """Hashes the provided password."""
-        password_bytes = password.encode('utf-8')
-        return pwd_context.hash(password_bytes[:72])
+        return await self.hasher.run(pwd_context.hash, self._password_bytes(password))
 
-    def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verifies a plain password against a hashed one."""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def _verify_password(self, plain_password: str, hashed_password: str):
+        """
+        Verifies a plain password against a hashed one.
+        Returns (valid, new hash or None if the stored hash is up to date).
+        """
+        return await self.hasher.run(pwd_context.verify_and_update, self._password_bytes(plain_password), hashed_password)
 
     # --- Business Logic Methods ---
     
-    def register_user(self, username: str, password: str) -> dict:
+    async def register_user(self, username: str, password: str) -> User:
         """Registers a new user in the database."""
         
         # 1. Check if user already exists
-        if self.user_repo.db.query(UserDB).filter(UserDB.username == username).first():
+        if await self.user_repo.get_user_by_username(username):
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT, 
                 detail="Username already registered"
             )
 
         # 2. Hash the password
-        hashed_password = self._hash_password(password)
+        hashed_password = await self._hash_password(password)
 
-        # 3. Create the new user ORM object
-        new_user = UserDB(
-            username=username,
-            hashed_password=hashed_password
-        )
-        
-        # 4. Save to database
-        self.user_repo.db.add(new_user)
-        self.user_repo.db.commit()
-        self.user_repo.db.refresh(new_user)
-        
-        return {"message": "User registered successfully"}
+        # 3. Save to database
+        return await self.user_repo.create_user(username, hashed_password)
 
-    def authenticate_user(self, username: str, password: str) -> dict:
+    async def authenticate_user(self, username: str, password: str) -> dict:
         """Authenticates user credentials and returns a JWT token."""
         
         # 1. Retrieve the user from the database
-        db_user = self.user_repo.db.query(UserDB).filter(UserDB.username == username).first()
+        db_user = await self.user_repo.get_user_in_db(username)
 
         # 2. Verify existence and password
-        if not db_user or not self._verify_password(password, db_user.hashed_password):
+        valid, new_hash = (False, None)
+        if db_user and db_user.is_active:
+            valid, new_hash = await self._verify_password(password, db_user.hashed_password)
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        # 2b. Stored with an outdated cost: replace the hash while we have the plain password
+        if new_hash:
+            await self.user_repo.update_password_hash(db_user.id, new_hash)
+
         # 3. Create the access token - DELEGATE TO JWT SERVICE
         # The JWTService handles the expiry and encoding logic internally
-        access_token = self.jwt_service.create_access_token(data={"sub": db_user.username})
+        access_token = self.jwt_service.create_access_token(data={"sub": db_user.username, "uid": db_user.id})
+
+        return {"access_token": access_token, "token_type": "bearer"}
 
-        return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    async def set_user_active(self, user_id: int, is_active: bool) -> None:
+        """Activates or deactivates a user; a deactivated user's cached tokens stop working."""
+        await self.user_repo.set_active(user_id, is_active)
+        if not is_active and self.principals is not None:
+            await asyncio.to_thread(self.principals.invalidate_user, user_id)
\ No newline at end of file
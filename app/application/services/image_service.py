@@ -1,28 +1,103 @@
-from typing import List, Dict, Any
+import asyncio
+import base64
+import binascii
+import json
+import time
+import uuid
+from concurrent.futures import Executor
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
 from fastapi import UploadFile
-from sqlalchemy.orm import Session
-from app.core.exceptions import ImageNotFoundError
+from app.core.cache import AsyncSingleFlight, TTLCache, SingleFlight, jittered_ttl
+from app.core.exceptions import ImageNotFoundError, InvalidCursorError, InvalidImageError, InvalidTransformationError
 from app.core.config import settings
-from app.domain.entities.image import Image, Transformation
-from app.infrastructure.persistence.image_repository import ImageRepository
-from app.infrastructure.adapters.storage_service import GoogleCloudStorageService 
-from app.infrastructure.adapters.message_queue import KafkaProducerAdapter
+from app.domain.entities.image import Image, ImagePage, JobStatus, Transformation, BatchTransformationResult, UploadedImage, reused_render_columns
+from app.infrastructure.persistence.image_repository import AsyncImageRepository
+from app.infrastructure.adapters.async_adapters import AsyncStorageService, AsyncTransformationQueue
+from app.infrastructure.adapters.image_processor import ImageProcessorAdapter, probe_image, resolve_auto_format
+from app.infrastructure.adapters.job_status import JobLeases, JobStatusHub, JobStatusPublisher, DONE, FAILED, QUEUED
 from app.infrastructure.adapters.redis_adapter import RedisAdapter # NEW Import
 
-# Use the new GCS service alias for internal consistency
-StorageService = GoogleCloudStorageService 
+def encode_cursor(image: Image) -> str:
+    """Opaque pagination token holding the (created_at, id) key of the last listed image."""
+    raw = json.dumps([image.created_at.isoformat(), image.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, image_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(image_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursorError()
+
+@asynccontextmanager
+async def _no_updates():
+    # Stands in for JobStatusHub.subscribe when the service has no hub
+    yield None
+
 
 class ImageService:
     # NEW dependency: redis
-    def __init__(self, repo: ImageRepository, storage: StorageService, producer: KafkaProducerAdapter, redis: RedisAdapter): 
+    def __init__(
+        self,
+        repo: AsyncImageRepository,
+        storage: AsyncStorageService,
+        producer: AsyncTransformationQueue,
+        redis: RedisAdapter,
+        url_cache: Optional[TTLCache] = None,
+        owner_cache: Optional[TTLCache] = None,
+        url_flights: Optional[SingleFlight] = None,
+        url_load_flights: Optional[AsyncSingleFlight] = None,
+        signing_pool: Optional[Executor] = None,
+        jobs: Optional[JobStatusHub] = None
+    ): 
         self.repo = repo
         self.storage = storage
         self.producer = producer
         self.redis = redis # NEW
+        # Process-wide L1 caches (see AdapterRegistry); private ones only live for this service
+        self.url_cache = url_cache if url_cache is not None else TTLCache(settings.IMAGE_URL_L1_MAX_ENTRIES)
+        self.owner_cache = owner_cache if owner_cache is not None else TTLCache(settings.IMAGE_URL_L1_MAX_ENTRIES)
+        # Signing is coalesced across threads (listings sign in parallel); single lookups on the event loop
+        self.url_flights = url_flights if url_flights is not None else SingleFlight()
+        self.url_load_flights = url_load_flights if url_load_flights is not None else AsyncSingleFlight()
+        # Signs the misses of a batch in parallel; without it they are signed one by one
+        self.signing_pool = signing_pool
+        # Job states are written to Redis here and by the worker; the hub wakes up waiting requests
+        self.job_status = JobStatusPublisher(redis)
+        self.leases = JobLeases(redis)
+        self.jobs = jobs
+        # Plans output sizes from the recorded dimensions, so bad requests fail before they are queued
+        self.planner = ImageProcessorAdapter()
+
+    async def upload_image(self, file: UploadFile, user_id: int, profile: Optional[str] = None) -> UploadedImage:
+        """
+        Uploads image to storage and saves metadata to DB.
+        Content is addressed by its SHA-256: bytes that are already stored (e.g. a client
+        retrying an upload) only get a new metadata row pointing at the existing object.
+        With a variant `profile`, its width ladder is queued right away (see request_variants).
+        The image's header properties (size, orientation, frames, mode, ICC) are recorded
+        from the spool without decoding it; files that are not images are rejected.
+        """
+        # Hash the local spool first; reading it is far cheaper than uploading it again
+        size_bytes, content_hash = await self.storage.hash_upload(file)
+        try:
+            properties = await self.storage.run(probe_image, file.file)
+        except ValueError:
+            raise InvalidImageError()
 
-    async def upload_image(self, file: UploadFile, user_id: int) -> Image:
-        """Uploads image to storage and saves metadata to DB."""
-        image_id, storage_url, size_bytes = await self.storage.upload_image(file, user_id)
+        storage_url = await self.repo.acquire_blob(content_hash)
+        if storage_url:
+            image_id = str(uuid.uuid4())
+            print(f"Upload deduplicated against existing content {content_hash[:12]}.")
+        else:
+            image_id, uploaded_url, size_bytes, content_hash = await self.storage.upload_image(file, user_id)
+            storage_url = await self.repo.register_blob(content_hash, uploaded_url, size_bytes)
+            if storage_url != uploaded_url:
+                # A concurrent upload of the same bytes registered first; ours is referenced by nothing
+                await self._discard_upload(uploaded_url)
         
         image_data = {
             "id": image_id,
@@ -31,79 +106,548 @@ class ImageService:
             "storage_url": storage_url, # Now stores GCS object path (e.g., '1/uuid.jpg')
             "mimetype": file.content_type,
             "size_bytes": size_bytes,
-            "image_metadata": {"original_filename": file.filename} # KEY RENAMED
+            "content_hash": content_hash,
+            "image_metadata": {"original_filename": file.filename}, # KEY RENAMED
+            **properties
         }
-        return self.repo.create_image(image_data)
+        try:
+            image = await self.repo.create_image(image_data)
+        except Exception:
+            # No row references the blob, so give back the reference taken above
+            await self._release_blob(content_hash)
+            raise
+        variants = await self.request_variants(image, settings.VARIANT_PROFILES[profile]) if profile else {}
+        return UploadedImage(**image.model_dump(), variants=variants)
+
+    async def _discard_upload(self, storage_url: str) -> None:
+        try:
+            await self.storage.run(self.storage.sync.delete_image, storage_url)
+        except Exception as e:
+            print(f"Could not delete duplicate upload {storage_url}: {e}")
+
+    async def _release_blob(self, content_hash: str) -> None:
+        try:
+            # The failed insert left the transaction unusable
+            await self.repo.release()
+            await self.repo.release_blob(content_hash)
+        except Exception as e:
+            print(f"Could not release blob {content_hash[:12]}: {e}")
 
-    def request_transformation(self, original_id: str, user_id: int, transformations: Transformation) -> Image:
+    async def request_variants(self, original: Image, widths: List[int]) -> Dict[int, str]:
+        """
+        Registers a derivative per width (height keeps the aspect ratio) and queues them
+        as one job, which the worker renders from a single decode by progressive
+        downscaling. Widths already rendered for identical content are reused, and
+        widths not smaller than the original are skipped (they would only upscale).
+        Returns the derivative id per width.
+        """
+        if original.width:
+            widths = [width for width in widths if width < original.width]
+        ladder = {width: Transformation(resize={"width": width}) for width in widths}
+        ids = {width: transformation.get_hash_id(original.id) for width, transformation in ladder.items()}
+
+        shared = {}
+        if original.content_hash:
+            shared = await self.repo.find_derivatives(
+                [(original.content_hash, transformation.fingerprint()) for transformation in ladder.values()]
+            )
+
+        rows = []
+        to_send = []
+        for width, transformation in ladder.items():
+            match = shared.get((original.content_hash, transformation.fingerprint()))
+            rows.append(self._derivative_data(original, ids[width], transformation, match))
+            if not match:
+                to_send.append((ids[width], transformation))
+        await self.repo.bulk_create_images(rows)
+
+        if to_send:
+            try:
+                await self.producer.run(self._send_ladder, original.id, to_send, original.user_id)
+            except Exception as e:
+                # The upload itself succeeded; the variants can still be requested one by one
+                print(f"Could not queue variants of {original.id}: {getattr(e, 'detail', None) or e}")
+        return ids
+
+    async def request_transformation(
+        self, original_id: str, user_id: int, transformations: Transformation, accept: Optional[str] = None
+    ) -> Image:
         """
         Validates image ownership, generates a transformation request, 
         and sends it to the message queue.
+        format="auto" is resolved from `accept` (the client's Accept header) first.
         """
-        original_image = self.repo.get_image_by_id(original_id)
+        original_image = await self.repo.get_image_by_id(original_id)
         
         if not original_image or original_image.user_id != user_id:
             raise ImageNotFoundError()
+        transformations = resolve_auto_format(transformations, accept, original_image.color_mode)
+        self._check_transformation(original_image, transformations)
             
         # 1. Generate new image ID based on transformations
         new_id = transformations.get_hash_id(original_id)
+        variant_key = transformations.fingerprint()
         
         # 2. Check cache/DB for pre-existing transformed image
-        cached_image = self.repo.get_image_by_id(new_id)
+        cached_image = await self.repo.get_image_by_id(new_id)
         if cached_image and cached_image.is_transformed:
             # Found in cache/DB, return immediately
             return cached_image
+
+        # 2b. The same bytes may have been uploaded (and transformed) under another image id
+        if not cached_image and original_image.content_hash:
+            shared = await self.repo.find_derivative(original_image.content_hash, variant_key)
+            if shared:
+                return await self.repo.create_image(
+                    self._derivative_data(original_image, new_id, transformations, shared)
+                )
             
         # 3. Create a placeholder entry for the new image in DB (for status tracking)
         if not cached_image:
-             placeholder_data = {
-                "id": new_id,
-                "user_id": user_id,
-                "filename": f"transformed_{original_image.filename}",
-                "storage_url": original_image.storage_url, # Original path until processed
-                "mimetype": original_image.mimetype,
-                "size_bytes": 0,
-                "image_metadata": transformations.model_dump(exclude_none=True), # KEY RENAMED
-                "is_transformed": False
-            }
-             placeholder_image = self.repo.create_image(placeholder_data)
+             placeholder_image = await self.repo.create_image(
+                 self._derivative_data(original_image, new_id, transformations)
+             )
         else:
              placeholder_image = cached_image
         
-        # 4. Send asynchronous request to Kafka
-        self.producer.send_transformation_request(original_id, new_id, transformations, user_id)
+        # 4. Send asynchronous request to Kafka, unless an identical job is already in flight
+        await self.producer.run(self._enqueue, original_id, new_id, transformations, user_id)
         
         return placeholder_image
 
-    def get_image_url(self, image_id: str, user_id: int) -> str:
+    async def request_transformations_batch(
+        self, image_ids: List[str], user_id: int, transformations: List[Transformation], accept: Optional[str] = None
+    ) -> List[BatchTransformationResult]:
+        """
+        Requests every transformation for every image (N x M derivatives) in one pass:
+        one ownership query, one lookup of existing derivatives, one bulk insert of
+        placeholders, and all Kafka sends enqueued into the same producer batch.
+        format="auto" is resolved per image from `accept`.
+        """
+        originals = {image.id: image for image in await self.repo.get_images_by_ids(image_ids, user_id)}
+
+        # 1. Plan every (image, transformation) pair, skipping duplicates in the request
+        planned: Dict[str, Tuple[Image, Transformation]] = {}
+        results: List[BatchTransformationResult] = []
+        for image_id in image_ids:
+            original = originals.get(image_id)
+            for index, transformation in enumerate(transformations):
+                if original is None:
+                    results.append(BatchTransformationResult(
+                        image_id=image_id, transformation_index=index, status="not_found",
+                        error="Image not found or access denied."
+                    ))
+                    continue
+                transformation = resolve_auto_format(transformation, accept, original.color_mode)
+                try:
+                    self._check_transformation(original, transformation)
+                except InvalidTransformationError as e:
+                    results.append(BatchTransformationResult(
+                        image_id=image_id, transformation_index=index, status="failed", error=e.detail
+                    ))
+                    continue
+                new_id = transformation.get_hash_id(image_id)
+                planned.setdefault(new_id, (original, transformation))
+                results.append(BatchTransformationResult(
+                    image_id=image_id, transformation_index=index, derivative_id=new_id, status="queued"
+                ))
+
+        # 2. Existing rows and derivatives shared through identical content, in two queries
+        existing = {image.id: image for image in await self.repo.get_images_by_ids(list(planned), user_id)}
+        shared = await self.repo.find_derivatives([
+            (original.content_hash, transformation.fingerprint())
+            for new_id, (original, transformation) in planned.items()
+            if new_id not in existing and original.content_hash
+        ])
+
+        new_rows = []
+        to_send = []
+        done = set()
+        for new_id, (original, transformation) in planned.items():
+            current = existing.get(new_id)
+            if current is not None:
+                if current.is_transformed:
+                    done.add(new_id)
+                else:
+                    to_send.append(new_id)
+                continue
+            match = shared.get((original.content_hash, transformation.fingerprint()))
+            new_rows.append(self._derivative_data(original, new_id, transformation, match))
+            if match:
+                done.add(new_id)
+            else:
+                to_send.append(new_id)
+
+        # 3. One insert for all placeholders
+        await self.repo.bulk_create_images(new_rows)
+
+        # 4. Enqueue without flushing; the producer ships them as batches
+        failed = await self.producer.run(self._send_all, planned, to_send, user_id)
+
+        for result in results:
+            if result.derivative_id in done:
+                result.status = "done"
+            elif result.derivative_id in failed:
+                result.status = "failed"
+                result.error = failed[result.derivative_id]
+        return results
+
+    def _check_transformation(self, original: Image, transformations: Transformation) -> None:
+        """Rejects a pipeline that would render nothing from `original` (known only once its size is recorded)."""
+        if original.width and original.height:
+            if self.planner.output_size((original.width, original.height), transformations) == (0, 0):
+                raise InvalidTransformationError()
+
+    def _enqueue(self, original_id: str, new_id: str, transformations: Transformation, user_id: int) -> None:
+        if not self.leases.acquire([new_id]):
+            print(f"Transformation {new_id} is already in flight; not sending it again.")
+            return
+        # Published before the send: a fast worker's later states must not be overwritten by it
+        self.job_status.publish(new_id, QUEUED)
+        try:
+            self.producer.sync.send_transformation_request(
+                original_id, new_id, transformations, user_id, on_delivery=self._on_delivery([new_id])
+            )
+        except Exception as e:
+            # Nothing was queued, so a retry must be able to send it
+            self.leases.release([new_id])
+            self.job_status.publish(new_id, FAILED, getattr(e, "detail", None) or str(e))
+            raise
+
+    def _send_all(
+        self, planned: Dict[str, Tuple[Image, Transformation]], to_send: List[str], user_id: int
+    ) -> Dict[str, str]:
+        """
+        Enqueues the planned jobs in order, skipping those already in flight; returns an
+        error for each job that could not be sent.
+        """
+        failed: Dict[str, str] = {}
+        to_send = self.leases.acquire(to_send)
+        # Published before the sends, so a fast worker's later states are not overwritten
+        self.job_status.publish_many(to_send, QUEUED)
+        for position, new_id in enumerate(to_send):
+            original, transformation = planned[new_id]
+            try:
+                self.producer.sync.send_transformation_request(
+                    original.id, new_id, transformation, user_id, on_delivery=self._on_delivery([new_id])
+                )
+            except Exception as e:
+                # Backpressure or an unavailable broker affects the rest of the batch too
+                error = getattr(e, "detail", None) or str(e)
+                failed.update({remaining: error for remaining in to_send[position:]})
+                self.leases.release(to_send[position:])
+                self.job_status.publish_many(to_send[position:], FAILED, error)
+                break
+        return failed
+
+    def _send_ladder(self, original_id: str, variants: List[Tuple[str, Transformation]], user_id: int) -> None:
+        leased = set(self.leases.acquire([new_id for new_id, _ in variants]))
+        variants = [(new_id, transformation) for new_id, transformation in variants if new_id in leased]
+        if not variants:
+            return
+        new_ids = [new_id for new_id, _ in variants]
+        self.job_status.publish_many(new_ids, QUEUED)
+        try:
+            self.producer.sync.send_variant_ladder(original_id, variants, user_id, on_delivery=self._on_delivery(new_ids))
+        except Exception as e:
+            self.leases.release(new_ids)
+            self.job_status.publish_many(new_ids, FAILED, getattr(e, "detail", None) or str(e))
+            raise
+
+    def _on_delivery(self, new_ids: List[str]) -> Callable[[Optional[Exception]], None]:
+        """
+        Delivery callback for a sent job (runs on the producer's sender thread). A message
+        the broker never acknowledged will not reach the worker, so its lease is released
+        and the job marked failed; otherwise the lease would block retries until it expires.
+        """
+        def on_delivery(error: Optional[Exception]) -> None:
+            if error is None:
+                return
+            try:
+                self.leases.release(new_ids)
+                self.job_status.publish_many(new_ids, FAILED, f"Could not queue transformation: {error}")
+            except Exception as e:
+                print(f"Could not record failed delivery of {', '.join(new_ids)}: {e}")
+        return on_delivery
+
+    def _derivative_data(
+        self, original: Image, new_id: str, transformations: Transformation, shared: Optional[Image] = None
+    ) -> Dict[str, Any]:
+        """
+        Row for a derivative of `original`: a placeholder pointing at the original until
+        the worker has rendered it, or a finished row reusing an identical `shared` render.
+        """
+        data = {
+            "id": new_id,
+            "user_id": original.user_id,
+            "filename": f"transformed_{original.filename}",
+            "storage_url": original.storage_url, # Original path until processed
+            "mimetype": original.mimetype,
+            "size_bytes": 0,
+            "content_hash": original.content_hash,
+            "variant_key": transformations.fingerprint(),
+            "image_metadata": transformations.canonical(), # KEY RENAMED
+            "is_transformed": False,
+        }
+        if shared:
+            data.update(reused_render_columns(shared))
+        return data
+
+    async def get_image_url(self, image_id: str, user_id: int) -> str:
         """
         Retrieves a time-limited signed URL for direct client access to the GCS object.
-        Implements caching for the signed URL.
+        Signed URLs are cached per object in process (L1) and in Redis (L2), so hot
+        images are usually redirected without touching the database, Redis or the signer.
         """
-        image = self.repo.get_image_by_id(image_id)
-        if not image or image.user_id != user_id:
+        storage_url = await self._owned_storage_url(image_id, user_id)
+
+        signed_url = self.url_cache.get(storage_url)
+        if signed_url:
+            return signed_url
+
+        # Concurrent misses for the same object sign it once; followers wait on the event loop,
+        # not in a storage executor thread (Redis and signing run off the event loop)
+        return await self.url_load_flights.do(
+            self._sign_flight_key(storage_url), lambda: self.storage.run(self._load_signed_url, storage_url)
+        )
+
+    async def _owned_storage_url(self, image_id: str, user_id: int) -> str:
+        """Ownership check, cached in process. Pending placeholders are not cached: their object changes when rendered."""
+        owner = self.owner_cache.get(image_id)
+        if owner is None:
+            image = await self.repo.get_image_by_id(image_id)
+            if not image:
+                raise ImageNotFoundError()
+            owner = (image.user_id, image.storage_url)
+            if image.is_transformed or not image.variant_key:
+                self.owner_cache.set(image_id, owner, settings.IMAGE_OWNER_CACHE_SECONDS)
+
+        owner_id, storage_url = owner
+        if owner_id != user_id:
             raise ImageNotFoundError()
-            
-        cache_key = f"image_url:{image_id}"
-        
-        # 1. Check Redis Cache
-        cached_url = self.redis.get(cache_key)
-        if cached_url:
-            print(f"Serving signed URL for {image_id} from Redis cache.")
-            return cached_url
-            
-        # 2. Generate new Signed URL
-        # The storage_url holds the GCS object path (blob name). 
-        signed_url = self.storage.generate_signed_url(image.storage_url) 
+        return storage_url
+
+    def _load_signed_url(self, storage_url: str) -> str:
+        # A flight that just finished may have cached it between our miss and this call
+        signed_url = self.url_cache.get(storage_url)
+        if signed_url:
+            return signed_url
+        now = time.time()
+
+        # 1. Check Redis Cache (the entry records when its signature expires)
+        signed_url = self._read_cached_url(storage_url, self.redis.get(self._url_cache_key(storage_url)), now)
+        if signed_url:
+            print(f"Serving signed URL for {storage_url} from Redis cache.")
+            return signed_url
+
+        # 2. Generate new Signed URL (shared with a listing signing the same object)
+        signed_url, expires_at = self.url_flights.do(self._sign_flight_key(storage_url), lambda: self._sign(storage_url))
 
         # 3. Store in Redis Cache
-        # Use a TTL slightly shorter than the GCS expiration to avoid serving expired links
-        ttl = settings.IMAGE_URL_CACHE_SECONDS 
-        self.redis.set(cache_key, signed_url, ttl)
-        print(f"Generated and cached signed URL for {image_id}.")
+        ttl = self._redis_url_ttl()
+        if ttl > 0:
+            self.redis.set(self._url_cache_key(storage_url), json.dumps({"url": signed_url, "expires_at": expires_at}), ttl)
+        print(f"Generated and cached signed URL for {storage_url}.")
         
         return signed_url
 
-    def list_user_images(self, user_id: int, page: int, limit: int) -> List[Image]:
-        """Lists images for a specific user."""
-        return self.repo.list_images_by_user(user_id, page, limit)
\ No newline at end of file
+    def get_image_urls(self, images: List[Image]) -> Dict[str, str]:
+        """
+        Signed URLs for a whole page of images, keyed by image id: in-process cache first,
+        then one Redis MGET for the rest. Only the remaining misses are signed, in
+        parallel, and they are written back to Redis in one pipeline.
+        """
+        urls: Dict[str, str] = {}
+        missing: Dict[str, List[str]] = {} # storage_url -> ids of the images stored there
+        for image in images:
+            # The caller already scoped the images to their owner; later GET /images/{id} can skip the DB
+            if image.is_transformed or not image.variant_key:
+                self.owner_cache.set(image.id, (image.user_id, image.storage_url), settings.IMAGE_OWNER_CACHE_SECONDS)
+            signed_url = self.url_cache.get(image.storage_url)
+            if signed_url:
+                urls[image.id] = signed_url
+            else:
+                missing.setdefault(image.storage_url, []).append(image.id)
+        if not missing:
+            return urls
+
+        now = time.time()
+        storage_urls = list(missing)
+        cached = self.redis.mget([self._url_cache_key(storage_url) for storage_url in storage_urls])
+
+        resolved: Dict[str, str] = {}
+        to_sign: List[str] = []
+        for storage_url, value in zip(storage_urls, cached):
+            signed_url = self._read_cached_url(storage_url, value, now)
+            if signed_url:
+                resolved[storage_url] = signed_url
+            else:
+                to_sign.append(storage_url)
+
+        if to_sign:
+            sign = lambda storage_url: self.url_flights.do(self._sign_flight_key(storage_url), lambda: self._sign(storage_url))
+            if self.signing_pool is not None and len(to_sign) > 1:
+                signatures = list(self.signing_pool.map(sign, to_sign))
+            else:
+                signatures = [sign(storage_url) for storage_url in to_sign]
+
+            entries = []
+            for storage_url, (signed_url, expires_at) in zip(to_sign, signatures):
+                resolved[storage_url] = signed_url
+                ttl = self._redis_url_ttl()
+                if ttl > 0:
+                    entries.append((self._url_cache_key(storage_url), json.dumps({"url": signed_url, "expires_at": expires_at}), ttl))
+            self.redis.set_many(entries)
+            print(f"Generated and cached {len(to_sign)} signed URLs.")
+
+        for storage_url, image_ids in missing.items():
+            for image_id in image_ids:
+                urls[image_id] = resolved[storage_url]
+        return urls
+
+    @staticmethod
+    def _url_cache_key(storage_url: str) -> str:
+        return f"signed_url:{storage_url}"
+
+    @staticmethod
+    def _sign_flight_key(storage_url: str) -> str:
+        return f"sign:{storage_url}"
+
+    def _read_cached_url(self, storage_url: str, cached: Optional[str], now: float) -> Optional[str]:
+        """The URL from a Redis entry if it still has enough validity left; it is also cached in process."""
+        if not cached:
+            return None
+        entry = json.loads(cached)
+        if entry["expires_at"] - now <= settings.IMAGE_URL_MIN_VALIDITY_SECONDS:
+            return None
+        self._cache_locally(storage_url, entry["url"], entry["expires_at"], now)
+        return entry["url"]
+
+    def _sign(self, storage_url: str) -> Tuple[str, float]:
+        """Signs a URL for the object (the storage_url holds the GCS object path) and caches it in process."""
+        now = time.time()
+        signed_url = self.storage.sync.generate_signed_url(storage_url)
+        expires_at = now + settings.GCS_SIGNED_URL_EXPIRATION_SECONDS
+        self._cache_locally(storage_url, signed_url, expires_at, now)
+        return signed_url, expires_at
+
+    @staticmethod
+    def _redis_url_ttl() -> int:
+        # The TTL stays below the signature's lifetime so a cached link always has validity left
+        ttl = min(
+            settings.IMAGE_URL_CACHE_SECONDS,
+            settings.GCS_SIGNED_URL_EXPIRATION_SECONDS - settings.IMAGE_URL_MIN_VALIDITY_SECONDS
+        )
+        return int(jittered_ttl(ttl, settings.IMAGE_URL_CACHE_JITTER))
+
+    def _cache_locally(self, storage_url: str, signed_url: str, expires_at: float, now: float) -> None:
+        remaining = expires_at - now - settings.IMAGE_URL_MIN_VALIDITY_SECONDS
+        ttl = min(settings.IMAGE_URL_L1_TTL_SECONDS, remaining)
+        self.url_cache.set(storage_url, signed_url, jittered_ttl(ttl, settings.IMAGE_URL_CACHE_JITTER))
+
+    async def list_user_images(self, user_id: int, limit: int, cursor: Optional[str] = None, include_urls: bool = False) -> ImagePage:
+        """
+        Lists images for a specific user, newest first, one page at a time.
+        With `include_urls`, the page also carries a signed URL for every item.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        # One extra row tells whether there is a next page
+        images = await self.repo.list_images_by_user(user_id, limit + 1, after)
+        next_cursor = encode_cursor(images[limit - 1]) if len(images) > limit else None
+        items = images[:limit]
+        urls = await self.storage.run(self.get_image_urls, items) if include_urls else None
+        return ImagePage(items=items, next_cursor=next_cursor, urls=urls)
+
+    async def get_job_status(self, image_id: str, user_id: int) -> JobStatus:
+        """
+        Current state of the transformation producing `image_id`. The database is
+        authoritative for finished derivatives (and originals); Redis has the rest.
+        """
+        image = await self.repo.get_image_by_id(image_id)
+        if not image or image.user_id != user_id:
+            raise ImageNotFoundError()
+        if image.is_transformed or not image.variant_key:
+            return JobStatus(id=image_id, status=DONE)
+        state = await self.storage.run(self.job_status.get, image_id)
+        if not state:
+            return JobStatus(id=image_id, status=QUEUED)
+        return JobStatus(id=image_id, status=state["status"], error=state.get("error"))
+
+    async def wait_for_job(self, image_id: str, user_id: int, timeout: float) -> JobStatus:
+        """
+        Long poll: returns as soon as the job is done or failed, or its current state
+        after `timeout` seconds.
+        """
+        async with self._job_updates(image_id) as updates:
+            # Subscribed before reading, so a transition in between is not missed
+            status = await self._read_job_status(image_id, user_id)
+            deadline = time.monotonic() + timeout
+            while not status.is_final:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                update = await self._next_job_status(image_id, user_id, updates, remaining)
+                if update is not None:
+                    status = update
+            return status
+
+    async def job_events(self, image_id: str, user_id: int) -> AsyncIterator[Optional[JobStatus]]:
+        """
+        Server-sent events source: the current state, then every change until the job
+        is done or failed (or JOB_EVENTS_MAX_SECONDS pass). None is yielded as a
+        keepalive while nothing changes. Ownership is checked before this returns.
+        """
+        stack = AsyncExitStack()
+        updates = await stack.enter_async_context(self._job_updates(image_id))
+        try:
+            status = await self._read_job_status(image_id, user_id)
+        except BaseException:
+            await stack.aclose()
+            raise
+        return self._stream_job_events(stack, image_id, user_id, updates, status)
+
+    async def _stream_job_events(
+        self, stack: AsyncExitStack, image_id: str, user_id: int, updates: Optional[asyncio.Queue], status: JobStatus
+    ) -> AsyncIterator[Optional[JobStatus]]:
+        async with stack:
+            yield status
+            deadline = time.monotonic() + settings.JOB_EVENTS_MAX_SECONDS
+            while not status.is_final:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = min(remaining, settings.JOB_EVENTS_KEEPALIVE_SECONDS)
+                update = await self._next_job_status(image_id, user_id, updates, timeout)
+                if update is not None and update != status:
+                    status = update
+                    yield status
+                else:
+                    yield None
+
+    def _job_updates(self, image_id: str):
+        if self.jobs is None:
+            return _no_updates()
+        return self.jobs.subscribe(image_id)
+
+    async def _read_job_status(self, image_id: str, user_id: int) -> JobStatus:
+        status = await self.get_job_status(image_id, user_id)
+        # Waiting must not hold a pooled connection
+        await self.repo.release()
+        return status
+
+    async def _next_job_status(
+        self, image_id: str, user_id: int, updates: Optional[asyncio.Queue], timeout: float
+    ) -> Optional[JobStatus]:
+        """The next published state, or None after `timeout`. Without pub/sub, re-reads the state instead."""
+        if updates is None:
+            await asyncio.sleep(min(timeout, settings.JOB_STATUS_POLL_INTERVAL_SECONDS))
+            return await self._read_job_status(image_id, user_id)
+        try:
+            event = await asyncio.wait_for(updates.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event["status"] is None:
+            # RESYNC_EVENT: the hub reconnected and may have missed this job's events
+            return await self._read_job_status(image_id, user_id)
+        return JobStatus(id=image_id, status=event["status"], error=event.get("error"))
+
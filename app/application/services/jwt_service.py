@@ -1,45 +1,40 @@
-import jwt
-from datetime import datetime, timedelta
-import os
+from jose import jwt, JWTError
+from datetime import datetime, timedelta, timezone
 from typing import Union # Imported to support type hints for Python < 3.10
-
-# JWT settings (should ideally come from config/env)
-SECRET_KEY = os.getenv("SECRET_KEY", "YOUR_SECURE_SECRET_KEY")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+from app.core.config import settings
 
 class JWTService:
     """Handles the creation and decoding of JSON Web Tokens."""
 
     def __init__(self):
-        # Service initialization, can load configurations here if needed
-        pass
+        # Same key and algorithm as get_current_user, which verifies these tokens
+        self.secret_key = settings.SECRET_KEY
+        self.algorithm = settings.ALGORITHM
 
     def create_access_token(self, data: dict, expires_delta: timedelta = None) -> str:
-        """Creates a JWT access token."""
+        """
+        Creates a JWT access token.
+        `data` should carry "sub" (the username) and "uid" (the user id), so requests
+        can be authenticated without looking the user up.
+        """
         to_encode = data.copy()
-        
+
         if expires_delta:
-            expire = datetime.utcnow() + expires_delta
+            expire = datetime.now(timezone.utc) + expires_delta
         else:
             # Use the default expiration time
-            expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        
-        # Add expiry and token type subject
-        to_encode.update({"exp": expire, "sub": "access"})
-        
+            expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+        to_encode.update({"exp": expire})
+
         # Encode the token using the secret key and algorithm
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
 
     def decode_token(self, token: str) -> Union[dict, None]:
-        """Decodes and validates a JWT token."""
+        """Decodes and validates a JWT token (signature and expiry)."""
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            return payload
-        except jwt.ExpiredSignatureError:
-            print("Token expired.")
-            return None 
-        except jwt.InvalidTokenError:
-            print("Invalid token provided.")
-            return None
\ No newline at end of file
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError as e:
+            print(f"Invalid token provided: {e}")
+            return None
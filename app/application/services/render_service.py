@@ -0,0 +1,104 @@
+from typing import Optional, Tuple
+from app.core.cache import ByteLRUCache, AsyncSingleFlight
+from app.core.config import settings
+from app.core.exceptions import ImageNotFoundError, InvalidTransformationError, RenderNotAllowedError
+from app.core.executors import BoundedExecutor
+from app.domain.entities.image import Image, Transformation
+from app.infrastructure.adapters.image_processor import ImageProcessorAdapter, resolve_auto_format
+from app.infrastructure.adapters.redis_adapter import RedisAdapter
+from app.infrastructure.adapters.async_adapters import AsyncStorageService
+from app.infrastructure.persistence.image_repository import AsyncImageRepository
+
+
+class RenderService:
+    """
+    Renders small transformations synchronously (imgproxy-style) instead of going
+    through Kafka. Results are looked up tier by tier: in-process LRU, Redis, an
+    already stored derivative, and only then rendered inline on a bounded executor.
+    Concurrent requests for the same render are coalesced into one.
+    """
+    def __init__(
+        self,
+        repo: AsyncImageRepository,
+        storage: AsyncStorageService,
+        redis: RedisAdapter,
+        cache: ByteLRUCache,
+        flights: AsyncSingleFlight,
+        executor: BoundedExecutor
+    ):
+        self.repo = repo
+        self.storage = storage
+        self.redis = redis
+        self.cache = cache
+        self.flights = flights
+        self.executor = executor
+        self.processor = ImageProcessorAdapter()
+
+    async def render(
+        self, image_id: str, user_id: int, transformation: Transformation, accept: Optional[str] = None
+    ) -> Tuple[bytes, Transformation]:
+        """
+        Returns the rendered bytes and the transformation they were rendered with
+        (format="auto" resolved from `accept`, the client's Accept header).
+        """
+        original = await self.repo.get_image_by_id(image_id)
+        if not original or original.user_id != user_id:
+            raise ImageNotFoundError()
+        transformation = resolve_auto_format(transformation, accept, original.color_mode)
+
+        # Keyed by content, so duplicate uploads of the same bytes share renders
+        cache_key = f"render:{original.content_hash or original.id}:{transformation.fingerprint()}"
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached, transformation
+
+        data = await self.flights.do(cache_key, lambda: self._load_or_render(cache_key, original, transformation))
+        return data, transformation
+
+    async def _load_or_render(self, cache_key: str, original: Image, transformation: Transformation) -> bytes:
+        # Redis round trips share the storage executor, as in ImageService
+        data = await self.storage.run(self.redis.get_bytes, cache_key)
+
+        if data is None:
+            data = await self._load_stored_derivative(original, transformation)
+
+        if data is None:
+            self._check_inline_budget(original, transformation)
+            source = await self.storage.download_image(original.storage_url)
+            data = await self.executor.run(self.processor.process_image, source, transformation)
+
+        await self.storage.run(self.redis.set_bytes, cache_key, data, settings.RENDER_CACHE_TTL_SECONDS)
+        self.cache.set(cache_key, data)
+        return data
+
+    async def _load_stored_derivative(self, original: Image, transformation: Transformation) -> Optional[bytes]:
+        """Bytes of a derivative the worker already rendered for this content and pipeline, if any."""
+        if original.content_hash:
+            derivative = await self.repo.find_derivative(original.content_hash, transformation.fingerprint())
+        else:
+            derivative = await self.repo.get_image_by_id(transformation.get_hash_id(original.id))
+        if not derivative or not derivative.is_transformed:
+            return None
+        try:
+            return await self.storage.download_image(derivative.storage_url)
+        except FileNotFoundError:
+            return None
+
+    def _check_inline_budget(self, original: Image, transformation: Transformation) -> None:
+        """Only cheap renders run inline; anything larger belongs on the asynchronous pipeline."""
+        if original.size_bytes > settings.RENDER_MAX_SOURCE_BYTES:
+            raise RenderNotAllowedError()
+        if original.width and original.height:
+            # The recorded size gives the real output size (a width-only resize of a tall image is tall)
+            if original.width * original.height > settings.RENDER_MAX_SOURCE_PIXELS:
+                raise RenderNotAllowedError()
+            output_size = self.processor.output_size((original.width, original.height), transformation)
+            if output_size == (0, 0):
+                raise InvalidTransformationError()
+            if max(output_size) > settings.RENDER_MAX_DIMENSION:
+                raise RenderNotAllowedError()
+        elif transformation.resize:
+            largest = max(transformation.resize.get("width") or 0, transformation.resize.get("height") or 0)
+            if largest > settings.RENDER_MAX_DIMENSION:
+                raise RenderNotAllowedError()
@@ -1,6 +1,7 @@
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
+from typing import Dict, List, Optional
 
 SECRET_KEY = os.getenv("SECRET_KEY", "DEFAULT_SECRET_KEY_NEVER_USE_IN_PROD_12345")
 
@@ -16,26 +17,123 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     
     DATABASE_URL: str = "sqlite:///./sql_app.db"
+    # Connection pools (per engine; the API and the worker each have their own)
+    DB_POOL_SIZE: int = Field(10, env="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(20, env="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT_SECONDS: int = Field(10, env="DB_POOL_TIMEOUT_SECONDS")
+    DB_POOL_RECYCLE_SECONDS: int = Field(1800, env="DB_POOL_RECYCLE_SECONDS")
+    DB_POOL_PRE_PING: bool = Field(True, env="DB_POOL_PRE_PING")
+    # asyncpg prepared statement cache per connection; set to 0 behind PgBouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = Field(100, env="DB_STATEMENT_CACHE_SIZE")
     
     SECRET_KEY: str = SECRET_KEY
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 # 1 day expiration
+    # Verified tokens are cached (never past their expiry): in process briefly, in Redis for longer
+    PRINCIPAL_L1_TTL_SECONDS: int = Field(60, env="PRINCIPAL_L1_TTL_SECONDS")
+    PRINCIPAL_L1_MAX_ENTRIES: int = Field(10000, env="PRINCIPAL_L1_MAX_ENTRIES")
+    PRINCIPAL_CACHE_SECONDS: int = Field(3600, env="PRINCIPAL_CACHE_SECONDS")
+    # Password hashing: bcrypt cost, and the pool it runs on (logins beyond workers + queue get a 503)
+    AUTH_BCRYPT_ROUNDS: int = Field(12, env="AUTH_BCRYPT_ROUNDS")
+    AUTH_HASH_WORKERS: int = Field(os.cpu_count() or 1, env="AUTH_HASH_WORKERS")
+    AUTH_HASH_MAX_QUEUE: int = Field(64, env="AUTH_HASH_MAX_QUEUE")
     
     STORAGE_PATH: str = "images_store"
+    # "gcs" for Google Cloud Storage, "local" to store files under STORAGE_PATH and serve them from the API
+    STORAGE_BACKEND: str = Field("gcs", env="STORAGE_BACKEND")
     
     GCS_BUCKET_NAME: str = Field("image-processor-bucket", env="GCS_BUCKET_NAME")
     
     GCS_SIGNED_URL_EXPIRATION_SECONDS: int = Field(GCS_EXPIRATION_DEFAULT, env="GCS_SIGNED_URL_EXPIRATION_SECONDS") 
     
+    # Uploads: hard size limit, and the size above which GCS resumable (chunked) uploads are used.
+    # GCS requires the chunk size to be a multiple of 256 KiB.
+    MAX_UPLOAD_SIZE_BYTES: int = Field(50 * 1024 * 1024, env="MAX_UPLOAD_SIZE_BYTES")
+    GCS_RESUMABLE_THRESHOLD_BYTES: int = Field(8 * 1024 * 1024, env="GCS_RESUMABLE_THRESHOLD_BYTES")
+    GCS_UPLOAD_CHUNK_SIZE: int = Field(8 * 1024 * 1024, env="GCS_UPLOAD_CHUNK_SIZE")
+
+    # Responsive variants (widths; height keeps the aspect ratio) rendered right after an upload, by
+    # profile name. Uploads use DEFAULT_VARIANT_PROFILE unless they pick one with ?variants=<name|none>
+    VARIANT_PROFILES: Dict[str, List[int]] = Field({"srcset": [160, 320, 640, 1280]}, env="VARIANT_PROFILES")
+    DEFAULT_VARIANT_PROFILE: Optional[str] = Field(None, env="DEFAULT_VARIANT_PROFILE")
+
+    # Upper bound on images x transformations in one POST /images/transform/batch
+    MAX_BATCH_TRANSFORMATIONS: int = Field(1000, env="MAX_BATCH_TRANSFORMATIONS")
+
+    # Synchronous rendering (GET /images/{id}/render): admission limits, executor size and cache budget
+    RENDER_MAX_SOURCE_BYTES: int = Field(5 * 1024 * 1024, env="RENDER_MAX_SOURCE_BYTES")
+    RENDER_MAX_DIMENSION: int = Field(1024, env="RENDER_MAX_DIMENSION")
+    RENDER_MAX_SOURCE_PIXELS: int = Field(24_000_000, env="RENDER_MAX_SOURCE_PIXELS")
+    RENDER_WORKERS: int = Field(os.cpu_count() or 1, env="RENDER_WORKERS")
+    RENDER_MAX_QUEUE: int = Field(32, env="RENDER_MAX_QUEUE")
+    RENDER_CACHE_MAX_BYTES: int = Field(64 * 1024 * 1024, env="RENDER_CACHE_MAX_BYTES")
+    RENDER_CACHE_TTL_SECONDS: int = Field(3600, env="RENDER_CACHE_TTL_SECONDS")
+    
     REDIS_HOST: str = Field("localhost", env="REDIS_HOST")
     REDIS_PORT: int = Field(6379, env="REDIS_PORT")
 
     IMAGE_URL_CACHE_SECONDS: int = Field(GCS_EXPIRATION_DEFAULT - 10, env="IMAGE_URL_CACHE_SECONDS")
+    # Signed URLs are never handed out with less validity left than this
+    IMAGE_URL_MIN_VALIDITY_SECONDS: int = Field(30, env="IMAGE_URL_MIN_VALIDITY_SECONDS")
+    IMAGE_URL_CACHE_JITTER: float = Field(0.1, env="IMAGE_URL_CACHE_JITTER")
+    # In-process (L1) caches in front of Redis and the database for GET /images/{id}
+    IMAGE_URL_L1_TTL_SECONDS: int = Field(60, env="IMAGE_URL_L1_TTL_SECONDS")
+    IMAGE_URL_L1_MAX_ENTRIES: int = Field(10000, env="IMAGE_URL_L1_MAX_ENTRIES")
+    IMAGE_OWNER_CACHE_SECONDS: int = Field(300, env="IMAGE_OWNER_CACHE_SECONDS")
+    # Threads signing the uncached URLs of a listing page (GET /images/?include_urls=true)
+    IMAGE_URL_SIGNING_WORKERS: int = Field(8, env="IMAGE_URL_SIGNING_WORKERS")
 
     KAFKA_BOOTSTRAP_SERVERS: str = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
     KAFKA_TRANSFORMATION_TOPIC: str = "image_transformations"
+    # Producer batching: sends are buffered locally and shipped every KAFKA_LINGER_MS or when a batch fills
+    KAFKA_LINGER_MS: int = Field(10, env="KAFKA_LINGER_MS")
+    KAFKA_BATCH_SIZE: int = Field(64 * 1024, env="KAFKA_BATCH_SIZE")
+    KAFKA_MAX_BLOCK_MS: int = Field(200, env="KAFKA_MAX_BLOCK_MS")
+    KAFKA_MAX_PENDING_MESSAGES: int = Field(10000, env="KAFKA_MAX_PENDING_MESSAGES")
+    KAFKA_CONSUMER_GROUP: str = Field("image-transformation-workers", env="KAFKA_CONSUMER_GROUP")
+
+    # Worker: number of Pillow processes and how many jobs may be in flight at once
+    WORKER_CONCURRENCY: int = Field(os.cpu_count() or 1, env="WORKER_CONCURRENCY")
+    WORKER_MAX_IN_FLIGHT: int = Field(32, env="WORKER_MAX_IN_FLIGHT")
+    WORKER_MAX_RETRIES: int = Field(3, env="WORKER_MAX_RETRIES")
+    # Upper bound on the decoded pixel memory of the images being rendered at once
+    WORKER_MEMORY_BUDGET_BYTES: int = Field(1024 * 1024 * 1024, env="WORKER_MEMORY_BUDGET_BYTES")
+    # Jobs polled together are grouped by original (one download and decode per group); after a
+    # non-empty poll the worker waits this long for more, and uploads a group's results in parallel
+    WORKER_BATCH_LINGER_MS: int = Field(50, env="WORKER_BATCH_LINGER_MS")
+    WORKER_UPLOAD_CONCURRENCY: int = Field(8, env="WORKER_UPLOAD_CONCURRENCY")
     
-    RATE_LIMIT: str = "10/minute"
+    # Transformation job states (queued/processing/done/failed) kept in Redis and published to waiting clients
+    JOB_STATUS_TTL_SECONDS: int = Field(24 * 3600, env="JOB_STATUS_TTL_SECONDS")
+    JOB_STATUS_MAX_WAIT_SECONDS: int = Field(30, env="JOB_STATUS_MAX_WAIT_SECONDS")
+    JOB_EVENTS_MAX_SECONDS: int = Field(300, env="JOB_EVENTS_MAX_SECONDS")
+    JOB_EVENTS_KEEPALIVE_SECONDS: int = Field(15, env="JOB_EVENTS_KEEPALIVE_SECONDS")
+    # Longest pause between attempts to reconnect the job event subscription (doubling from one second)
+    JOB_STATUS_HUB_RECONNECT_MAX_SECONDS: float = Field(30.0, env="JOB_STATUS_HUB_RECONNECT_MAX_SECONDS")
+    # Lease taken when a job is enqueued; repeated requests for the derivative are not sent again while
+    # it is held. Should exceed the time a job takes (with retries); the worker extends it while working
+    JOB_LEASE_SECONDS: int = Field(300, env="JOB_LEASE_SECONDS")
+    # Without Redis, waiting clients are answered by re-reading the database this often
+    JOB_STATUS_POLL_INTERVAL_SECONDS: float = Field(1.0, env="JOB_STATUS_POLL_INTERVAL_SECONDS")
+    
+    # Token bucket per client, as "<requests>/<second|minute|hour|day>"; routes may cost more than one request
+    RATE_LIMIT: str = Field("10/minute", env="RATE_LIMIT")
+    # Used while Redis is unreachable: per-process buckets, at most this many clients tracked
+    RATE_LIMIT_LOCAL_MAX_CLIENTS: int = Field(10000, env="RATE_LIMIT_LOCAL_MAX_CLIENTS")
+
+    # Dedicated executors for blocking storage SDK calls and Kafka enqueues made by request handlers
+    STORAGE_IO_WORKERS: int = Field(16, env="STORAGE_IO_WORKERS")
+    STORAGE_IO_MAX_QUEUE: int = Field(256, env="STORAGE_IO_MAX_QUEUE")
+    QUEUE_IO_WORKERS: int = Field(4, env="QUEUE_IO_WORKERS")
+    QUEUE_IO_MAX_QUEUE: int = Field(1024, env="QUEUE_IO_MAX_QUEUE")
+
+    # Event loop watchdog: reports (with a stack trace) anything blocking the loop longer than the threshold
+    EVENT_LOOP_LAG_THRESHOLD_MS: int = Field(100, env="EVENT_LOOP_LAG_THRESHOLD_MS")
+    EVENT_LOOP_MONITOR_INTERVAL_MS: int = Field(50, env="EVENT_LOOP_MONITOR_INTERVAL_MS")
+    EVENT_LOOP_DEBUG: bool = Field(False, env="EVENT_LOOP_DEBUG")
+
+    # Shared adapters: how often the lifespan task checks health and retries failed connections
+    ADAPTER_HEALTH_CHECK_INTERVAL_SECONDS: int = Field(15, env="ADAPTER_HEALTH_CHECK_INTERVAL_SECONDS")
 
     
 settings = Settings()
\ No newline at end of file
@@ -1,24 +1,49 @@
-from fastapi import Depends
+import asyncio
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
+from typing import Optional
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.core.exceptions import InvalidCredentials, UserNotFound
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.principals import PrincipalCache
 from app.domain.entities.user import User
-from app.infrastructure.persistence.user_repository import UserRepository # Needed for DB lookup
+from app.infrastructure.persistence.user_repository import AsyncUserRepository # Needed for DB lookup
+from app.infrastructure.adapters.registry import AdapterRegistry
 
 # This scheme will be used for dependency injection in protected endpoints
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login")
 
-def get_user_repository(db: Session = Depends(get_db)) -> UserRepository:
+def get_adapters(request: Request) -> AdapterRegistry:
+    """Dependency provider for the process-wide adapters created in the application lifespan."""
+    return request.app.state.adapters
+
+def get_user_repository(db: AsyncSession = Depends(get_async_db)) -> AsyncUserRepository:
     """Dependency provider for the User Repository."""
-    return UserRepository(db=db)
+    return AsyncUserRepository(db=db)
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme), 
-    user_repo: UserRepository = Depends(get_user_repository)
+    user_repo: AsyncUserRepository = Depends(get_user_repository)
 ) -> User:
+    """
+    Resolves the bearer token to its User entity.
+    Tokens verified before are served from the PrincipalCache (in process, then Redis);
+    only the first use of a token decodes it and loads the user.
+    """
+    adapters = getattr(request.app.state, "adapters", None)
+    principals: Optional[PrincipalCache] = adapters.principals if adapters is not None else None
+
+    if principals is not None:
+        user = principals.get_local(token) or await asyncio.to_thread(principals.get_shared, token)
+        if user is not None:
+            return user
+
+    return await _resolve_token(token, user_repo, principals)
+
+async def _resolve_token(token: str, user_repo: AsyncUserRepository, principals: Optional[PrincipalCache]) -> User:
     """
     Decodes the JWT token, validates it, and fetches the corresponding User entity.
     """
@@ -28,6 +53,7 @@ async def get_current_user(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
         username: str = payload.get("sub")
+        user_id: Optional[int] = payload.get("uid")
         
         if username is None:
             raise InvalidCredentials(detail="Invalid authentication token payload.")
@@ -36,10 +62,18 @@ async def get_current_user(
         # JWT token is malformed, expired, or signature is invalid
         raise InvalidCredentials(detail="Invalid or expired token.")
 
-    # Fetch user from the database
-    user = user_repo.get_user_by_username(username=username)
+    # Fetch user from the database (by primary key; tokens issued before "uid" carry only the username).
+    # Loading it once per token, rather than trusting the claims alone, keeps deactivation effective.
+    if user_id is not None:
+        user = await user_repo.get_user_by_id(user_id)
+    else:
+        user = await user_repo.get_user_by_username(username=username)
 
     if user is None:
         raise UserNotFound(detail="Token user not found in database.")
-        
-    return user
\ No newline at end of file
+    if not user.is_active:
+        raise InvalidCredentials(detail="Inactive user.")
+
+    if principals is not None and payload.get("exp"):
+        await asyncio.to_thread(principals.set, token, user, float(payload["exp"]))
+    return user
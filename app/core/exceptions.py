@@ -21,10 +21,46 @@ class ImageNotFoundError(ServiceException):
     def __init__(self, detail: str = "Image not found or access denied."):
         super().__init__(status_code = status.HTTP_404_NOT_FOUND, detail = detail)
         
+class InvalidCursorError(ServiceException):
+    def __init__(self, detail: str = "Invalid pagination cursor."):
+        super().__init__(status_code = status.HTTP_400_BAD_REQUEST, detail = detail)
+
+class InvalidImageError(ServiceException):
+    def __init__(self, detail: str = "Uploaded file is not a supported image."):
+        super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+class InvalidTransformationError(ServiceException):
+    def __init__(self, detail: str = "Crop box lies outside the image."):
+        super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
 class TransformationError(ServiceException):
     def __init__(self, detail: str = "Failed to apply one or more transformations."):
         super().__init__(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
 
 class RegistrationError(ServiceException):
     def __init__(self, detail: str = "Username already exists."):
-        super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
\ No newline at end of file
+        super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+class QueueBackpressureError(ServiceException):
+    def __init__(self, detail: str = "Transformation queue is busy. Please retry shortly."):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": "1"}
+        )
+
+class UploadTooLargeError(ServiceException):
+    def __init__(self, detail: str = "Uploaded file exceeds the maximum allowed size."):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+class ServiceOverloadedError(ServiceException):
+    def __init__(self, detail: str = "Server is busy. Please retry shortly."):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": "1"}
+        )
+
+class RenderNotAllowedError(ServiceException):
+    def __init__(self, detail: str = "Transformation is too expensive to render synchronously. Use POST /images/{image_id}/transform."):
+        super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.core.exceptions import ServiceOverloadedError
+
+# Number of recent queue waits kept per executor for percentiles
+WAIT_SAMPLES = 1024
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on queued work.
+
+    At most `max_workers` calls run at once and at most `max_queue` more may wait;
+    beyond that `run` fails immediately with a 503 instead of letting latency grow.
+    Records how long calls waited for a thread (see `stats`).
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+        self._started = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._outstanding >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ServiceOverloadedError()
+            self._outstanding += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._timed, time.perf_counter(), fn, args
+            )
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+
+    def _timed(self, submitted_at: float, fn: Callable[..., Any], args: tuple) -> Any:
+        wait = time.perf_counter() - submitted_at
+        with self._lock:
+            self._started += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._waits.append(wait)
+        return fn(*args)
+
+    @property
+    def outstanding(self) -> int:
+        return self._outstanding
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, rejections and queue wait times (ms; percentiles over the recent calls)."""
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "outstanding": self._outstanding,
+                "running": min(self._outstanding, self.max_workers),
+                "queued": max(0, self._outstanding - self.max_workers),
+                "capacity": self.max_workers + self.max_queue,
+                "started": self._started,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._wait_total / self._started * 1000, 3) if self._started else 0.0,
+                "queue_wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+        for label, fraction in (("p50", 0.5), ("p99", 0.99)):
+            value = waits[min(len(waits) - 1, int(len(waits) * fraction))] if waits else 0.0
+            stats[f"queue_wait_{label}_ms"] = round(value * 1000, 3)
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
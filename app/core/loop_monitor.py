@@ -0,0 +1,83 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+
+class EventLoopMonitor:
+    """
+    Detects code that blocks the event loop.
+
+    A coroutine on the loop records a heartbeat every `interval`; a watchdog thread
+    notices when the heartbeat is older than `threshold` and prints the stack the
+    loop thread is executing at that moment, i.e. the blocking call itself. Each
+    stall is reported once, with its total duration when the loop recovers.
+    """
+    def __init__(self, threshold_ms: int, interval_ms: int):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._beat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+        self.stalls = 0
+        self.max_lag = 0.0
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if settings.EVENT_LOOP_DEBUG:
+            # asyncio's own slow-callback warnings name the callback; debug mode costs throughput
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+        self._beat = time.perf_counter()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = now - expected
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                print(f"EventLoopMonitor: event loop was blocked for {lag * 1000:.0f} ms.")
+            self._beat = now
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stopped.wait(self.interval / 2):
+            beat = self._beat
+            if beat == reported_beat or time.perf_counter() - beat <= self.threshold + self.interval:
+                continue
+            reported_beat = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            print(
+                f"EventLoopMonitor: event loop blocked for more than {self.threshold * 1000:.0f} ms. "
+                f"It is currently executing:\n{stack}"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "threshold_ms": round(self.threshold * 1000, 3),
+        }
@@ -1,76 +1,170 @@
+import asyncio
+import json
+import math
+import re
+import threading
 import time
-from collections import defaultdict
-from typing import Callable, Optional
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from collections import OrderedDict
+from typing import Optional, Tuple, List
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
 
 # Import the function that determines the user ID (which we just created)
 from app.api.deps import get_current_user_id
+from app.core.config import settings
 
 # --- Configuration for Rate Limiting ---
-MAX_REQUESTS = 5      # Maximum number of requests allowed
-TIME_WINDOW = 60      # Time window in seconds (5 requests per minute)
+WINDOW_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
 
-# In-memory store for tracking requests. 
-# WARNING: This is volatile. For production, replace with Redis or similar.
-RATE_LIMIT_STORE = defaultdict(lambda: {"count": 0, "first_request_time": 0.0})
 
-class RateLimiterMiddleware(BaseHTTPMiddleware):
+def parse_rate_limit(value: str) -> Tuple[int, int]:
+    """Parses "10/minute" (or "10/60s") into (requests, window in seconds)."""
+    count, _, unit = value.strip().partition("/")
+    unit = unit.strip().lower().rstrip("s") or "minute"
+    if unit.isdigit():
+        return int(count), int(unit)
+    if unit not in WINDOW_UNITS:
+        raise ValueError(f"Invalid RATE_LIMIT '{value}'")
+    return int(count), WINDOW_UNITS[unit]
+
+
+MAX_REQUESTS, TIME_WINDOW = parse_rate_limit(settings.RATE_LIMIT)
+
+# Cost of a request in tokens, by (method, path pattern); the first match wins and
+# everything else costs 1. A cost of 0 exempts the route from rate limiting.
+ROUTE_COSTS: List[Tuple[str, "re.Pattern", int]] = [
+    ("GET", re.compile(r"^/health$"), 0),
+    # Signed local-storage downloads: the HMAC signature authorizes them, and a listing's thumbnails load at once
+    ("GET", re.compile(rf"^{settings.API_V1_STR}/images/files/"), 0),
+    ("POST", re.compile(rf"^{settings.API_V1_STR}/images/?$"), 5),
+    ("POST", re.compile(rf"^{settings.API_V1_STR}/images/transform/batch$"), 10),
+    ("POST", re.compile(rf"^{settings.API_V1_STR}/images/[^/]+/transform$"), 2),
+    ("GET", re.compile(rf"^{settings.API_V1_STR}/images/[^/]+/render$"), 2),
+]
+
+
+def route_cost(method: str, path: str) -> int:
+    for route_method, pattern, cost in ROUTE_COSTS:
+        if method == route_method and pattern.match(path):
+            return cost
+    return 1
+
+
+class LocalTokenBuckets:
     """
-    Implements a simple, in-memory rate limiting mechanism.
+    In-process token buckets used while Redis is unreachable.
+
+    Bounded to `max_clients` entries, evicting the least recently seen client, so
+    a flood of unique IPs cannot grow it without limit. Limits are per process.
+    """
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: int, refill_per_second: float, cost: int) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+
+            allowed = tokens >= cost
+            retry_after = 0.0
+            if allowed:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / refill_per_second
+
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return allowed, tokens, retry_after
+
+
+class RateLimiterMiddleware:
+    """
+    Distributed token-bucket rate limiting as a pure ASGI middleware.
 
     It identifies the client first by authenticated user ID (if available)
-    and falls back to using the client's IP address.
+    and falls back to using the client's IP address. Buckets live in Redis and are
+    checked and decremented by a single Lua script, so the limit holds across
+    workers and replicas; while Redis is down a bounded per-process limiter is used.
     """
-    
+
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
         self.max_requests = MAX_REQUESTS
         self.time_window = TIME_WINDOW
+        self.refill_per_second = self.max_requests / self.time_window
+        self.local = LocalTokenBuckets(settings.RATE_LIMIT_LOCAL_MAX_CLIENTS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cost = min(route_cost(scope["method"], scope["path"]), self.max_requests)
+        if cost <= 0:
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        
         # 1. Determine the Client ID for rate limiting
-        
+        client_id = await self._client_id(Request(scope))
+
+        # 2. Check and enforce the rate limit
+        allowed, remaining, retry_after = await self._consume(scope, client_id, cost)
+
+        # Seconds until the bucket is full again
+        reset_after = math.ceil((self.max_requests - remaining) / self.refill_per_second)
+        headers = {
+            "X-RateLimit-Limit": str(self.max_requests),
+            "X-RateLimit-Remaining": str(int(remaining)),
+            "X-RateLimit-Reset": str(int(time.time()) + reset_after),
+        }
+
+        if not allowed:
+            # Rate limit exceeded (HTTP 429 Too Many Requests)
+            wait = math.ceil(retry_after)
+            body = json.dumps({"detail": f"Rate limit exceeded for client '{client_id}'. Try again in {wait} seconds."}).encode("utf-8")
+            raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+            raw_headers += [
+                (b"retry-after", str(wait).encode("latin-1")),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ]
+            await send({"type": "http.response.start", "status": 429, "headers": raw_headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # 3. Proceed, adding the rate limit headers to the response as it starts
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _client_id(self, request: Request) -> str:
         # Try to get the authenticated user ID (None if unauthenticated)
         client_id: Optional[str] = await get_current_user_id(request)
-        
-        if client_id is None:
-            # Fallback to IP address if the user is not authenticated
-            # Checks for X-Forwarded-For (for use behind proxies/load balancers)
-            client_ip = request.headers.get("x-forwarded-for") or request.client.host
-            client_id = client_ip
+        if client_id is not None:
+            return f"user:{client_id}"
 
-        # 2. Check and enforce the rate limit
-        
-        now = time.time()
-        record = RATE_LIMIT_STORE[client_id]
-
-        # Check if the time window has passed. If so, reset the count.
-        if now - record["first_request_time"] > self.time_window:
-            record["count"] = 1
-            record["first_request_time"] = now
-        else:
-            record["count"] += 1
-
-            if record["count"] > self.max_requests:
-                # Rate limit exceeded (HTTP 429 Too Many Requests)
-                return JSONResponse(
-                    {"detail": f"Rate limit exceeded for client '{client_id}'. Try again in {self.time_window} seconds."},
-                    status_code=429,
-                )
-
-        # 3. Proceed to the next middleware or endpoint
-        response = await call_next(request)
-        
-        # 4. Add Rate Limit headers for client information
-        response.headers["X-RateLimit-Limit"] = str(self.max_requests)
-        response.headers["X-RateLimit-Remaining"] = str(max(0, self.max_requests - record["count"]))
-        
-        # Calculate when the window resets
-        reset_time = int(record["first_request_time"] + self.time_window)
-        response.headers["X-RateLimit-Reset"] = str(reset_time)
-        
-        return response
\ No newline at end of file
+        # Checks for X-Forwarded-For (for use behind proxies/load balancers); the first hop is the client
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return f"ip:{forwarded.split(',')[0].strip()}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    async def _consume(self, scope: Scope, client_id: str, cost: int) -> Tuple[bool, float, float]:
+        # The shared RedisAdapter is owned by the AdapterRegistry built in the lifespan
+        adapters = getattr(scope["app"].state, "adapters", None) if "app" in scope else None
+        redis = adapters.redis if adapters is not None else None
+        if redis is not None and redis.is_available():
+            result = await asyncio.to_thread(
+                redis.consume_tokens, f"ratelimit:{client_id}", self.max_requests, self.refill_per_second, cost
+            )
+            if result is not None:
+                return result
+        return self.local.consume(client_id, self.max_requests, self.refill_per_second, cost)
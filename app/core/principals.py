@@ -0,0 +1,64 @@
+import hashlib
+import json
+import time
+from typing import Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.domain.entities.user import User
+from app.infrastructure.adapters.redis_adapter import RedisAdapter
+
+
+class PrincipalCache:
+    """
+    Cache of verified bearer tokens: token hash -> the User it authenticates.
+
+    Entries never outlive the token's `exp`. The in-process LRU answers most
+    requests without decoding the token or touching the database; Redis (optional)
+    shares verified tokens between processes. Deactivating a user drops their
+    entries from Redis and from this process; other processes forget them within
+    PRINCIPAL_L1_TTL_SECONDS.
+    """
+    def __init__(self, redis: Optional[RedisAdapter] = None):
+        self.redis = redis
+        self.local = TTLCache(settings.PRINCIPAL_L1_MAX_ENTRIES)
+
+    @staticmethod
+    def _token_hash(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get_local(self, token: str) -> Optional[User]:
+        """In-process lookup only; never blocks on the network."""
+        return self.local.get(self._token_hash(token))
+
+    def get_shared(self, token: str) -> Optional[User]:
+        """Looks the token up in Redis and, on a hit, caches it in process."""
+        if self.redis is None:
+            return None
+        token_hash = self._token_hash(token)
+        cached = self.redis.get(f"principal:{token_hash}")
+        if not cached:
+            return None
+        entry = json.loads(cached)
+        user = User.model_validate(entry["user"])
+        self.local.set(token_hash, user, min(settings.PRINCIPAL_L1_TTL_SECONDS, entry["exp"] - time.time()))
+        return user
+
+    def set(self, token: str, user: User, expires_at: float) -> None:
+        token_hash = self._token_hash(token)
+        remaining = expires_at - time.time()
+        self.local.set(token_hash, user, min(settings.PRINCIPAL_L1_TTL_SECONDS, remaining))
+
+        ttl = int(min(settings.PRINCIPAL_CACHE_SECONDS, remaining))
+        if self.redis is None or ttl <= 0:
+            return
+        entry = {"user": user.model_dump(exclude={"access_token"}), "exp": expires_at}
+        self.redis.set(f"principal:{token_hash}", json.dumps(entry), ttl)
+        # Index of the user's cached tokens, so deactivation can find them
+        self.redis.add_to_set(f"principal:user:{user.id}", token_hash, settings.PRINCIPAL_CACHE_SECONDS)
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.local.delete_matching(lambda user: user.id == user_id)
+        if self.redis is None:
+            return
+        token_hashes = self.redis.pop_set(f"principal:user:{user_id}")
+        self.redis.delete(*[f"principal:{token_hash}" for token_hash in token_hashes])
@@ -1,6 +1,30 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-import uuid
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, Any, List
+from datetime import datetime
+import hashlib
+import json
+
+# Bump whenever the canonical encoding (or the rendering it describes) changes,
+# so previously cached derivatives are not mistaken for new ones.
+TRANSFORMATION_FINGERPRINT_VERSION = 4
+
+DEFAULT_OUTPUT_FORMAT = "JPEG"
+FORMAT_ALIASES = {"JPG": "JPEG"}
+# Formats the image processor can encode
+OUTPUT_FORMATS = {"JPEG", "PNG", "WEBP", "AVIF", "GIF"}
+QUALITY_FORMATS = {"JPEG", "WEBP", "AVIF"}
+# Resolved per request from the Accept header and the image (see resolve_auto_format); never rendered as such
+AUTO_FORMAT = "AUTO"
+
+# Encoder settings trading CPU for bytes (parameters per format live in the image processor)
+ENCODER_PRESETS = ("fast", "balanced", "smallest")
+DEFAULT_ENCODER_PRESET = "balanced"
+# Quality each preset encodes with when the request gives none
+PRESET_QUALITIES: Dict[str, Dict[str, int]] = {
+    "fast": {"JPEG": 80, "WEBP": 80, "AVIF": 70},
+    "balanced": {"JPEG": 80, "WEBP": 80, "AVIF": 65},
+    "smallest": {"JPEG": 70, "WEBP": 70, "AVIF": 55},
+}
 
 class Transformation(BaseModel):
     # This models the transformations requested in the API
@@ -13,11 +37,83 @@ class Transformation(BaseModel):
     compress_quality: Optional[int] = Field(None, ge=1, le=100)
     format: Optional[str] = None             
     filters: Optional[Dict[str, bool]] = None 
+    preset: Optional[str] = None
     
+    @field_validator("format")
+    @classmethod
+    def _normalize_format(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        value = value.strip().upper()
+        value = FORMAT_ALIASES.get(value, value)
+        if value not in OUTPUT_FORMATS and value != AUTO_FORMAT:
+            raise ValueError(f"format must be one of {', '.join(sorted(OUTPUT_FORMATS))} or AUTO")
+        return value
+
+    @field_validator("preset")
+    @classmethod
+    def _check_preset(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        value = value.strip().lower()
+        if value not in ENCODER_PRESETS:
+            raise ValueError(f"preset must be one of {', '.join(ENCODER_PRESETS)}")
+        return value
+
+    def canonical(self) -> Dict[str, Any]:
+        """
+        Normalized form of the pipeline: parameters that do not change the output are
+        dropped and defaults are made explicit, so equivalent requests compare equal.
+        The result is itself a valid Transformation payload.
+        """
+        canonical: Dict[str, Any] = {}
+
+        if self.resize:
+            resize = {k: v for k, v in self.resize.items() if k in ("width", "height") and v}
+            if resize:
+                canonical["resize"] = resize
+
+        if self.crop:
+            crop = {k: v for k, v in self.crop.items() if k in ("x", "y", "width", "height")}
+            crop.setdefault("x", 0)
+            crop.setdefault("y", 0)
+            # Without a width or height the crop starts at the origin and keeps everything
+            if "width" in crop or "height" in crop or crop["x"] or crop["y"]:
+                canonical["crop"] = crop
+
+        if self.rotate is not None and self.rotate % 360:
+            canonical["rotate"] = self.rotate % 360
+
+        if self.watermark:
+            canonical["watermark"] = self.watermark
+        if self.flip:
+            canonical["flip"] = True
+        if self.mirror:
+            canonical["mirror"] = True
+
+        output_format = self.format or DEFAULT_OUTPUT_FORMAT
+        preset = self.preset or DEFAULT_ENCODER_PRESET
+        canonical["format"] = output_format
+        if output_format in QUALITY_FORMATS and self.compress_quality not in (None, PRESET_QUALITIES[preset].get(output_format)):
+            canonical["compress_quality"] = self.compress_quality
+        canonical["preset"] = preset
+
+        if self.filters:
+            filters = {name: True for name, enabled in self.filters.items() if enabled}
+            if filters:
+                canonical["filters"] = filters
+
+        return canonical
+
+    def fingerprint(self) -> str:
+        """Stable, versioned digest of the canonical pipeline."""
+        encoded = json.dumps(self.canonical(), sort_keys=True, separators=(",", ":"))
+        payload = f"v{TRANSFORMATION_FINGERPRINT_VERSION}:{encoded}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:32]
+
     # Generate a unique ID for the resulting image file based on transformations
     def get_hash_id(self, original_id: str) -> str:
-        transform_str = str(self.model_dump(exclude_none=True))
-        return f"{original_id}_{uuid.uuid5(uuid.NAMESPACE_DNS, transform_str).hex}"
+        return f"{original_id}_{self.fingerprint()}"
 
 
 class Image(BaseModel):
@@ -29,6 +125,70 @@ class Image(BaseModel):
     size_bytes: int
     image_metadata: Dict[str, Any] = Field(default_factory=dict) # RENAMED from 'metadata'
     is_transformed: bool = False
+    content_hash: Optional[str] = None
+    variant_key: Optional[str] = None
+    # Header properties (see ImageDB); None for images stored before they were recorded
+    width: Optional[int] = None
+    height: Optional[int] = None
+    orientation: Optional[int] = None
+    frame_count: Optional[int] = None
+    color_mode: Optional[str] = None
+    has_icc_profile: Optional[bool] = None
+    created_at: Optional[datetime] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Header properties a finished derivative shares with an identical render
+RENDERED_PROPERTIES = ("width", "height", "orientation", "frame_count", "color_mode", "has_icc_profile")
+
+
+def reused_render_columns(shared: Image) -> Dict[str, Any]:
+    """Columns that complete a derivative by pointing it at `shared`, an identical finished render."""
+    columns = {
+        "storage_url": shared.storage_url,
+        "mimetype": shared.mimetype,
+        "size_bytes": shared.size_bytes,
+        "is_transformed": True,
+    }
+    columns.update({field: getattr(shared, field) for field in RENDERED_PROPERTIES})
+    return columns
+
+
+class UploadedImage(Image):
+    # Derivative id per width of the variant profile queued with the upload
+    variants: Dict[int, str] = Field(default_factory=dict)
+
+
+class ImagePage(BaseModel):
+    items: List[Image]
+    # Opaque token for the next page; None on the last page
+    next_cursor: Optional[str] = None
+    # Signed URL per image id, when requested with include_urls
+    urls: Optional[Dict[str, str]] = None
+
+
+class BatchTransformationRequest(BaseModel):
+    # Every transformation is applied to every image (len(image_ids) x len(transformations) derivatives)
+    image_ids: List[str] = Field(..., min_length=1)
+    transformations: List[Transformation] = Field(..., min_length=1)
+
+
+class BatchTransformationResult(BaseModel):
+    image_id: str
+    transformation_index: int
+    derivative_id: Optional[str] = None
+    status: str # "queued", "done", "not_found" or "failed"
+    error: Optional[str] = None
+
+
+class JobStatus(BaseModel):
+    # State of the transformation producing derivative `id`
+    id: str
+    status: str # "queued", "processing", "done" or "failed"
+    error: Optional[str] = None
+
+    @property
+    def is_final(self) -> bool:
+        return self.status in ("done", "failed")
@@ -17,5 +17,9 @@ class User(UserBase):
         from_attributes = True 
         populate_by_name = True
 
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+
 class UserInDB(User):
     hashed_password: str
\ No newline at end of file
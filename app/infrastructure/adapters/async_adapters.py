@@ -0,0 +1,48 @@
+from typing import Any, Callable, Tuple
+from fastapi import UploadFile
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+from app.infrastructure.adapters.message_queue import KafkaProducerAdapter
+from app.infrastructure.adapters.storage_service import StorageService, hash_stream
+
+
+class AsyncStorageService:
+    """
+    Awaitable facade over a StorageService for request handlers.
+
+    Every blocking SDK call (uploads, downloads, signing) runs on a dedicated bounded
+    executor, so a slow GCS request only occupies one of its threads instead of the
+    event loop, and a saturated storage backend answers 503 instead of queueing forever.
+    The wrapped adapter stays available as `sync` for code already running in a thread.
+    """
+    def __init__(self, storage: StorageService, executor: BoundedExecutor):
+        self.sync = storage
+        self.executor = executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Runs any other blocking storage work on the storage executor."""
+        return await self.executor.run(fn, *args)
+
+    async def hash_upload(self, file: UploadFile) -> Tuple[int, str]:
+        """(size, sha256) of the upload spool; reading a large spool is disk I/O too."""
+        return await self.executor.run(hash_stream, file.file, settings.MAX_UPLOAD_SIZE_BYTES)
+
+    async def upload_image(self, file: UploadFile, user_id: int) -> Tuple[str, str, int, str]:
+        return await self.executor.run(self.sync.upload_stream, file.file, user_id, file.filename, file.content_type)
+
+    async def download_image(self, storage_url: str) -> bytes:
+        return await self.executor.run(self.sync.download_image, storage_url)
+
+
+class AsyncTransformationQueue:
+    """
+    Awaitable facade over the KafkaProducerAdapter. Enqueueing normally returns at
+    once, but blocks for up to KAFKA_MAX_BLOCK_MS when the producer buffer is full or
+    metadata is missing; that wait happens on a small dedicated executor.
+    """
+    def __init__(self, producer: KafkaProducerAdapter, executor: BoundedExecutor):
+        self.sync = producer
+        self.executor = executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await self.executor.run(fn, *args)
@@ -1,52 +1,257 @@
-from PIL import Image as PILImage, ImageDraw, ImageFont, ImageOps
+from PIL import Image as PILImage, ImageDraw, ImageFont, ImageOps, features
 from io import BytesIO
-from typing import Dict, Any
-from app.domain.entities.image import Transformation
+from typing import BinaryIO, Dict, Any, List, Optional, Set, Tuple, Union
+from app.domain.entities.image import Transformation, AUTO_FORMAT, DEFAULT_ENCODER_PRESET, OUTPUT_FORMATS, PRESET_QUALITIES, QUALITY_FORMATS
 import math
 
+# Rotations that are exact pixel transposes (PIL rotates counter-clockwise)
+ORTHOGONAL_ROTATIONS = {
+    90: PILImage.Transpose.ROTATE_90,
+    180: PILImage.Transpose.ROTATE_180,
+    270: PILImage.Transpose.ROTATE_270,
+}
+
+# Let resize() box-reduce by integer factors first when shrinking by more than this factor
+REDUCING_GAP = 3.0
+
+# Modes each encoder can write without a conversion
+ENCODER_MODES = {
+    "JPEG": {"RGB", "L"},
+    "PNG": {"RGB", "RGBA", "L", "LA"},
+    "WEBP": {"RGB", "RGBA", "L"},
+    "AVIF": {"RGB", "RGBA"},
+}
+
+# Save parameters per preset and format. "fast" skips the extra encoder passes, "balanced"
+# buys smaller files with optimized (progressive) Huffman tables and slower WebP/AVIF
+# searches, "smallest" also lowers the default quality and optimizes PNGs (several
+# seconds for a large photo). Qualities come from PRESET_QUALITIES; an explicit one wins.
+ENCODER_PRESET_PARAMS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "fast": {
+        "JPEG": {"subsampling": "4:2:0"},
+        "WEBP": {"method": 0},
+        "AVIF": {"speed": 10},
+        "PNG": {"compress_level": 1},
+    },
+    "balanced": {
+        "JPEG": {"subsampling": "4:2:0", "optimize": True, "progressive": True},
+        "WEBP": {"method": 4},
+        "AVIF": {"speed": 6},
+        "PNG": {"compress_level": 6},
+    },
+    "smallest": {
+        "JPEG": {"subsampling": "4:2:0", "optimize": True, "progressive": True},
+        "WEBP": {"method": 6},
+        "AVIF": {"speed": 5},
+        "PNG": {"optimize": True},
+    },
+}
+
+# JPEGs at or above this quality keep full colour resolution (4:4:4)
+FULL_CHROMA_QUALITY = 90
+
+# Formats format="auto" may pick, most compact first, limited to the encoders this Pillow has
+AUTO_CANDIDATES = [fmt for fmt, feature in (("AVIF", "avif"), ("WEBP", "webp")) if features.check(feature)]
+
+# Source modes that are graphics rather than photos, or carry transparency
+PALETTE_MODES = {"P", "PA", "1"}
+ALPHA_MODES = {"RGBA", "LA", "PA", "P"}
+
+# Modes resize() handles as they are; any other source is converted to the working mode first
+WORKING_MODES = {"RGB", "RGBA", "L", "LA"}
+
+# EXIF tag holding the orientation (1-8) a viewer should apply
+EXIF_ORIENTATION = 0x0112
+
+
+def accepted_image_types(accept: Optional[str]) -> Set[str]:
+    """Media types an Accept header lists explicitly (q > 0); wildcards do not count."""
+    accepted = set()
+    for entry in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and "*" not in media_type and quality > 0:
+            accepted.add(media_type.lower())
+    return accepted
+
+
+def resolve_auto_format(transformations: Transformation, accept: Optional[str], color_mode: Optional[str]) -> Transformation:
+    """
+    Replaces format="auto" with a concrete format, before the pipeline is fingerprinted:
+    the most compact one the client accepts (AVIF, then WebP; WebP first for palette
+    graphics, where AVIF does poorly), else PNG for images that may be transparent or
+    are palette graphics, and JPEG for the rest.
+    `color_mode` is the source's recorded Pillow mode (None if unknown).
+    """
+    if transformations.format != AUTO_FORMAT:
+        return transformations
+    accepted = accepted_image_types(accept)
+    candidates = AUTO_CANDIDATES
+    if color_mode in PALETTE_MODES:
+        candidates = sorted(candidates, key = lambda fmt: fmt != "WEBP")
+    chosen = next((fmt for fmt in candidates if f"image/{fmt.lower()}" in accepted), None)
+    if chosen is None:
+        chosen = "PNG" if color_mode in ALPHA_MODES | PALETTE_MODES else "JPEG"
+    return transformations.model_copy(update = {"format": chosen})
+
+
+def probe_image(source: Union[bytes, BinaryIO]) -> Dict[str, Any]:
+    """
+    Reads the properties stored with an image from its header alone, without decoding
+    any pixels: size, EXIF orientation, frame count, pixel mode and whether it embeds
+    an ICC profile. Keys match the ImageDB columns. A file object is rewound afterwards.
+    Raises ValueError if the data is not an image Pillow can read.
+    """
+    stream = source if hasattr(source, "read") else BytesIO(source)
+    position = stream.tell()
+    try:
+        with PILImage.open(stream) as img:
+            orientation = None
+            if "exif" in img.info:
+                # Parsed from the raw segment: getexif() makes some formats (PNG) decode the whole image
+                exif = PILImage.Exif()
+                exif.load(img.info["exif"])
+                orientation = exif.get(EXIF_ORIENTATION)
+            return {
+                "width": img.width,
+                "height": img.height,
+                "orientation": orientation,
+                "frame_count": getattr(img, "n_frames", 1),
+                "color_mode": img.mode,
+                "has_icc_profile": bool(img.info.get("icc_profile")),
+            }
+    except Exception as e:
+        raise ValueError(f"Unreadable image: {e}")
+    finally:
+        stream.seek(position)
+
+
 class ImageProcessorAdapter:
 
     def process_image(self, image_data: bytes, transformations: Transformation) -> bytes:
         """
         Applies transformations and returns the processed image data bytes.
+
+        The geometry (rotate -> resize -> crop) is planned up front so that the source is
+        decoded at the smallest scale that still covers the output (JPEG draft mode), only
+        the cropped region is resampled, and right-angle rotations happen on the final,
+        small image. The result matches applying the operations in the documented order.
+        """
+        img = self._open(image_data)
+        return self._render(img, self._resolve_resize(transformations, img.size))
+
+    def process_variants(self, image_data: Union[bytes, BinaryIO], variants: List[Transformation]) -> List[Union[bytes, Exception]]:
+        """
+        Renders several transformations of the same image, decoding it only once.
+
+        The source is decoded at the smallest JPEG draft scale that still covers the
+        largest variant, then every variant is rendered from that decoded image. Plain
+        resizes (a srcset ladder) are downscaled progressively: largest first, each one
+        from the previous result rather than from the full-size source.
+        `image_data` may also be a seekable file object (e.g. over shared memory).
+        Returns the output bytes per variant, in order, or the exception it raised.
         """
-        input_buffer = BytesIO(image_data)
+        img = self._open(image_data)
+        # Sizes are resolved against the full-size header, so outputs match process_image exactly
+        variants = [self._resolve_resize(t, img.size) for t in variants]
+
+        modes = {self._working_mode(img, self._output_format(t), t) for t in variants}
+        decode_mode = ("L" if modes == {"L"} else "RGB") if modes <= {"RGB", "L"} else None
+        scale = max((self._decode_scale(img.size, t) for t in variants), default = 1.0)
+        requested = None
+        if scale < 1:
+            requested = (max(1, math.ceil(img.width * scale)), max(1, math.ceil(img.height * scale)))
+        if requested or decode_mode:
+            img.draft(decode_mode, requested)
+        img.load()
+
+        outputs: List[Union[bytes, Exception]] = [None] * len(variants)
+        ladder = [i for i, t in enumerate(variants) if self._is_plain_resize(t)]
+        ladder.sort(key = lambda i: variants[i].resize["width"] * variants[i].resize["height"], reverse = True)
+        # Last (smallest) rendered step per pixel mode; steps are only chained within a mode
+        previous: Dict[str, PILImage.Image] = {}
+        for i in ladder:
+            transformations = variants[i]
+            target = (transformations.resize["width"], transformations.resize["height"])
+            try:
+                mode = self._working_mode(img, self._output_format(transformations), transformations)
+                step = previous.get(mode)
+                if step is not None and step.width >= target[0] and step.height >= target[1]:
+                    pixels = step.resize(target, reducing_gap = REDUCING_GAP)
+                else:
+                    pixels = self._transform(img, transformations)
+                previous[mode] = pixels
+                outputs[i] = self._encode(pixels, transformations)
+            except Exception as e:
+                outputs[i] = e
 
+        for i, transformations in enumerate(variants):
+            if outputs[i] is not None:
+                continue
+            try:
+                outputs[i] = self._render(img, transformations)
+            except Exception as e:
+                outputs[i] = e
+        return outputs
+
+    def _open(self, image_data: Union[bytes, BinaryIO]) -> PILImage.Image:
         try:
-            img = PILImage.open(input_buffer).convert("RGB")
+            return PILImage.open(image_data if hasattr(image_data, "read") else BytesIO(image_data))
+        except PILImage.UnidentifiedImageError:
+            # Kept as is, so callers can tell a file that is not an image from a failure
+            raise
         except Exception as e:
             raise Exception(f"Failed to open image with PIL: {e}")
 
-        if transformations.rotate is not None:
-            img = self._apply_rotate(img, transformations.rotate)
+    @staticmethod
+    def _output_format(transformations: Transformation) -> str:
+        return transformations.format.upper() if transformations.format else "JPEG"
 
-        if transformations.resize:
-            img = self._apply_resize(img, transformations.resize)
+    def _render(self, img: PILImage.Image, transformations: Transformation) -> bytes:
+        """Applies the transformations to an opened (possibly already decoded) image; `img` is not modified."""
+        return self._encode(self._transform(img, transformations), transformations)
 
-        if transformations.crop:
-            img = self._apply_crop(img, transformations.crop)
+    def _transform(self, img: PILImage.Image, transformations: Transformation) -> PILImage.Image:
+        # Determine output format
+        output_format = self._output_format(transformations)
+
+        mode = self._working_mode(img, output_format, transformations)
+        img = self._apply_geometry(img, transformations, mode)
+        if img.mode != mode:
+            img = img.convert(mode)
 
         if transformations.flip: 
-            img = self.transpose(img, transformations.FLIP_TOP_BOTTOM)
+            img = img.transpose(PILImage.Transpose.FLIP_TOP_BOTTOM)
         
         if transformations.mirror:
-            img = self.transpose(img, transformations.FLIP_LEFT_RIGHT)
+            img = img.transpose(PILImage.Transpose.FLIP_LEFT_RIGHT)
 
         if transformations.filters:
             img = self._apply_filters(img, transformations.filters)
             
         if transformations.watermark:
              img = self._apply_watermark(img, transformations.watermark)
+        return img
 
-        # Determine output format and quality
-        output_format = transformations.format.upper() if transformations.format else "JPEG"
+    def _encode(self, img: PILImage.Image, transformations: Transformation) -> bytes:
+        output_format = self._output_format(transformations)
+        if output_format not in OUTPUT_FORMATS:
+            # Pillow would raise KeyError, which the worker treats as worth retrying
+            raise ValueError(f"Unsupported output format: {output_format}")
 
-        # Check if quality parameter is valid for the format
-        save_params = {}
-        if output_format in ["JPEG", "WEBP"] and transformations.compress_quality:
-            save_params['quality'] = transformations.compress_quality
-        elif output_format == "PNG":
-            save_params['optimiize'] = True
+        preset = transformations.preset or DEFAULT_ENCODER_PRESET
+        save_params = dict(ENCODER_PRESET_PARAMS[preset].get(output_format, {}))
+        if output_format in QUALITY_FORMATS:
+            save_params["quality"] = transformations.compress_quality or PRESET_QUALITIES[preset][output_format]
+        if output_format == "JPEG" and save_params["quality"] >= FULL_CHROMA_QUALITY:
+            save_params["subsampling"] = "4:4:4"
 
         output_buffer = BytesIO()
         img.save(output_buffer, format = output_format, **save_params)
@@ -54,15 +259,212 @@ class ImageProcessorAdapter:
 
         return output_buffer.read()
 
-    def _apply_resize(self, img: PILImage.Image, resize_params: Dict[str, int]) -> PILImage.Image:
+    # --- Planning ---
+
+    def _resolve_resize(self, transformations: Transformation, size: Tuple[int, int]) -> Transformation:
+        """Fills in the missing side of a width- or height-only resize from the source's aspect ratio."""
+        resize = transformations.resize or {}
+        if not (resize.get("width") or resize.get("height")) or (resize.get("width") and resize.get("height")):
+            return transformations
+        angle = transformations.rotate % 360 if transformations.rotate is not None else 0
+        width, height = self._resize_target(resize, self._rotated_size(size, angle))
+        return transformations.model_copy(update = {"resize": {"width": width, "height": height}})
+
+    def output_size(self, size: Tuple[int, int], transformations: Transformation) -> Tuple[int, int]:
+        """
+        Size of the image rendering `transformations` produces from a source of `size`,
+        planned without the pixels (to within a pixel after an arbitrary rotation).
+        (0, 0) means the crop box lies outside the image.
+        """
+        angle = transformations.rotate % 360 if transformations.rotate is not None else 0
+        frame = tuple(round(side) for side in self._rotated_size(size, angle))
+        target = self._resize_target(transformations.resize, frame) if transformations.resize else None
+        width, height = target or frame
+        if transformations.crop:
+            left, top, right, bottom = self._crop_box(transformations.crop, (width, height))
+            width, height = right - left, bottom - top
+            if width <= 0 or height <= 0:
+                return (0, 0)
+        return (int(width), int(height))
+
+    @staticmethod
+    def _is_plain_resize(transformations: Transformation) -> bool:
+        canonical = transformations.canonical()
+        return "resize" in canonical and set(canonical) <= {"resize", "format", "compress_quality", "preset"}
+
+    def _working_mode(self, img: PILImage.Image, output_format: str, transformations: Transformation) -> str:
+        """Picks the cheapest pixel mode that still produces the requested output."""
+        filters = transformations.filters or {}
+        if filters.get("grayscale") and not filters.get("sepia") and not transformations.watermark:
+            # JPEG sources decode straight to luminance, skipping colour conversion entirely
+            return "L"
+        if img.mode in ENCODER_MODES.get(output_format, {"RGB"}):
+            return img.mode
+        if img.mode in ("P", "PA") and "RGBA" in ENCODER_MODES.get(output_format, set()) and "transparency" in img.info:
+            return "RGBA"
+        return "RGB"
+
+    def _decode_scale(self, size: Tuple[int, int], transformations: Transformation) -> float:
+        """Fraction of the source resolution this transformation needs (1.0 unless it resizes down)."""
+        angle = transformations.rotate % 360 if transformations.rotate is not None else 0
+        target = self._resize_target(transformations.resize, self._rotated_size(size, angle)) if transformations.resize else None
+        if not target:
+            return 1.0
+        return min(1.0, self._prerotate_scale(size, angle, target))
+
+    def _resize_target(self, resize_params: Dict[str, int], frame_size: Tuple[float, float]) -> Optional[Tuple[int, int]]:
+        """Output size for resizing a frame of `frame_size`; a missing width or height keeps the aspect ratio."""
         width = resize_params.get("width")
         height = resize_params.get("height")
         if width and height:
-            return img.resize({width, height})
+            return (width, height)
+        if width:
+            return (width, max(1, round(frame_size[1] * width / frame_size[0])))
+        if height:
+            return (max(1, round(frame_size[0] * height / frame_size[1])), height)
+        return None
+
+    def _rotated_size(self, size: Tuple[int, int], angle: int) -> Tuple[float, float]:
+        """Size of the frame after rotating by `angle` with expand=True."""
+        if angle in (90, 270):
+            return (size[1], size[0])
+        radians = math.radians(angle)
+        cos, sin = abs(math.cos(radians)), abs(math.sin(radians))
+        return (size[0] * cos + size[1] * sin, size[0] * sin + size[1] * cos)
+
+    def _crop_box(self, crop_params: Dict[str, int], size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """Crop box clipped to an image of `size`, exactly as _apply_crop clips it."""
+        x = crop_params.get("x", 0)
+        y = crop_params.get("y", 0)
+        width = crop_params.get("width", size[0])
+        height = crop_params.get("height", size[1])
+
+        box = [max(0, b) for b in (x, y, x + width, y + height)]
+        box[2] = min(size[0], box[2])
+        box[3] = min(size[1], box[3])
+        return tuple(box)
+
+    def _apply_geometry(self, img: PILImage.Image, transformations: Transformation, mode: str) -> PILImage.Image:
+        angle = transformations.rotate % 360 if transformations.rotate is not None else 0
+        target = self._resize_target(transformations.resize, self._rotated_size(img.size, angle)) if transformations.resize else None
+
+        if angle == 0 or angle in ORTHOGONAL_ROTATIONS:
+            return self._apply_orthogonal_geometry(img, angle, target, transformations.crop, mode)
+
+        # Arbitrary angles: rotating is the expensive step, so shrink uniformly before it
+        # (uniform scaling commutes with rotation) and finish with the exact resize and crop.
+        scale = self._prerotate_scale(img.size, angle, target) if target else 1.0
+        shrunk = scale < 1
+        img = self._decode(img, (img.width * scale, img.height * scale) if shrunk else None, mode)
+        if shrunk:
+            scale = self._prerotate_scale(img.size, angle, target)
+            if scale < 1:
+                img = img.resize(
+                    (max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                    reducing_gap = REDUCING_GAP
+                )
+
+        # A pre-shrunk image is rotated with interpolation to make up for the resize that
+        # would otherwise have smoothed nearest-neighbour rotation at full resolution
+        img = self._apply_rotate(
+            img, transformations.rotate,
+            PILImage.Resampling.BICUBIC if shrunk else PILImage.Resampling.NEAREST
+        )
+        if transformations.resize:
+            img = self._apply_resize(img, transformations.resize)
+        if transformations.crop:
+            img = self._apply_crop(img, transformations.crop)
+        return img
+
+    def _prerotate_scale(self, size: Tuple[int, int], angle: int, target: Tuple[int, int]) -> float:
+        """Largest uniform scale after which rotating by `angle` still covers the resize target."""
+        rotated_w, rotated_h = self._rotated_size(size, angle)
+        return max(target[0] / rotated_w, target[1] / rotated_h)
+
+    def _apply_orthogonal_geometry(
+        self,
+        img: PILImage.Image,
+        angle: int,
+        target: Optional[Tuple[int, int]],
+        crop_params: Optional[Dict[str, int]],
+        mode: str
+    ) -> PILImage.Image:
+        """
+        Rotate by a multiple of 90 degrees, resize and crop as a single resample of the
+        source region that survives the crop, followed by a lossless transpose.
+        """
+        source_w, source_h = img.size
+        swapped = angle in (90, 270)
+        rotated_size = (source_h, source_w) if swapped else (source_w, source_h)
+        output_frame = target or rotated_size
+
+        # Region of the final (rotated + resized) frame that is kept, mapped back to the source
+        box = self._crop_box(crop_params, output_frame) if crop_params else (0, 0) + tuple(output_frame)
+        scale_x = rotated_size[0] / output_frame[0]
+        scale_y = rotated_size[1] / output_frame[1]
+        rotated_box = (box[0] * scale_x, box[1] * scale_y, box[2] * scale_x, box[3] * scale_y)
+        source_box = self._unrotate_box(rotated_box, angle, (source_w, source_h))
+
+        out_w, out_h = max(1, box[2] - box[0]), max(1, box[3] - box[1])
+        out_size = (out_h, out_w) if swapped else (out_w, out_h)
+
+        box_w, box_h = source_box[2] - source_box[0], source_box[3] - source_box[1]
+        resampling = target is not None and (round(box_w), round(box_h)) != out_size
+
+        if resampling and box_w > 0 and box_h > 0:
+            # Decode only as much resolution as the output needs
+            factor = max(out_size[0] / box_w, out_size[1] / box_h)
+            img = self._decode(img, (source_w * factor, source_h * factor), mode)
+            ratio_x, ratio_y = img.width / source_w, img.height / source_h
+            scaled_box = (
+                source_box[0] * ratio_x, source_box[1] * ratio_y,
+                source_box[2] * ratio_x, source_box[3] * ratio_y
+            )
+            img = img.resize(out_size, box = scaled_box, reducing_gap = REDUCING_GAP)
+        else:
+            img = self._decode(img, None, mode)
+            if crop_params:
+                img = img.crop(tuple(int(round(v)) for v in source_box))
+
+        if angle in ORTHOGONAL_ROTATIONS:
+            img = img.transpose(ORTHOGONAL_ROTATIONS[angle])
+        return img
+
+    def _unrotate_box(self, box: Tuple[float, ...], angle: int, source_size: Tuple[int, int]) -> Tuple[float, ...]:
+        """Maps a box in the frame rotated counter-clockwise by `angle` back to source coordinates."""
+        x0, y0, x1, y1 = box
+        width, height = source_size
+        if angle == 90:
+            return (width - y1, x0, width - y0, x1)
+        if angle == 180:
+            return (width - x1, height - y1, width - x0, height - y0)
+        if angle == 270:
+            return (y0, height - x1, y1, height - x0)
+        return box
+
+    def _decode(self, img: PILImage.Image, min_size: Optional[Tuple[float, float]], mode: str) -> PILImage.Image:
+        """
+        Loads the image. JPEG sources are decoded with DCT scaling (up to 8x smaller) when
+        `min_size` allows it, and straight into the working mode when that is RGB or L.
+        """
+        if min_size is not None or mode in ("RGB", "L"):
+            requested = (max(1, math.ceil(min_size[0])), max(1, math.ceil(min_size[1]))) if min_size else None
+            # draft() is a no-op for formats other than JPEG
+            img.draft(mode if mode in ("RGB", "L") else None, requested)
+        img.load()
+        if img.mode not in WORKING_MODES:
+            # Palette, bilevel and 16-bit/float images must be converted before they can be resampled
+            img = img.convert(mode)
+        return img
+
+    def _apply_resize(self, img: PILImage.Image, resize_params: Dict[str, int]) -> PILImage.Image:
+        target = self._resize_target(resize_params, img.size)
+        if target:
+            return img.resize(target)
         return img
 
     def _apply_crop(self, img: PILImage.Image, crop_params: Dict[str, int]) -> PILImage.Image:
-        x = crep_params.get("x", 0)
+        x = crop_params.get("x", 0)
         y = crop_params.get("y", 0)
         width = crop_params.get("width", img.width)
         height = crop_params.get("height", img.height)
@@ -75,8 +477,8 @@ class ImageProcessorAdapter:
 
         return img.crop(box)
 
-    def _apply_rotate(self, img: PILImage.Image, angle: int) -> PILImage.Image :
-        return image.rotate(angle, expand = True)
+    def _apply_rotate(self, img: PILImage.Image, angle: int, resample: int = PILImage.Resampling.NEAREST) -> PILImage.Image :
+        return img.rotate(angle, resample = resample, expand = True)
 
     def _apply_filters(self, img: PILImage.Image, filters: Dict[str, bool]) -> PILImage.Image:
         if filters.get("grayscale"):
@@ -89,6 +491,9 @@ class ImageProcessorAdapter:
 
     def _apply_watermark(self, img: PILImage.Image, text: str) -> PILImage.Image:
         """Applies a simple text watermark to the bottom-right corner."""
+        # Draws in place, so never on an image that may be shared with other variants
+        img = img.convert("RGB") if img.mode != "RGB" else img.copy()
+
         draw = ImageDraw.Draw(img)
 
         try: 
@@ -96,14 +501,14 @@ class ImageProcessorAdapter:
         except IOError: 
             font = ImageFont.load_default()
 
-        text_color = {255, 255, 255, 128}
+        text_color = (255, 255, 255)
 
         bbox = draw.textbbox((0, 0), text, font = font)
-        textWidth, textHeight = bbox[2] - bbox[0], bbox[3], bbox[1]
+        textWidth, textHeight = bbox[2] - bbox[0], bbox[3] - bbox[1]
 
         margin = 10
         x = img.width - textWidth - margin
-        y = img.heght - textHeight - margin
+        y = img.height - textHeight - margin
 
         draw.text((x, y), text, font = font, fill = text_color)
         return img
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.infrastructure.adapters.redis_adapter import RedisAdapter
+
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+FINAL_STATES = {DONE, FAILED}
+# Handed to waiters after the hub reconnects: events may have been missed, so re-read the state
+RESYNC_EVENT: Dict[str, object] = {"status": None}
+
+
+def job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def job_channel(job_id: str) -> str:
+    return f"job-events:{job_id}"
+
+
+def lease_key(job_id: str) -> str:
+    return f"job-lease:{job_id}"
+
+
+class JobStatusPublisher:
+    """
+    Records transformation job states for the API and the worker.
+
+    The latest state is stored under job:{id} (expiring after JOB_STATUS_TTL_SECONDS)
+    and published on job-events:{id}, so clients waiting on the job wake up at once.
+    """
+    def __init__(self, redis: RedisAdapter):
+        self.redis = redis
+
+    def publish(self, job_id: str, status: str, error: Optional[str] = None) -> bool:
+        return self.publish_many([job_id], status, error)
+
+    def publish_many(self, job_ids: List[str], status: str, error: Optional[str] = None) -> bool:
+        entries = []
+        for job_id in job_ids:
+            value = json.dumps({"status": status, "error": error, "updated_at": time.time()})
+            entries.append((job_key(job_id), value, settings.JOB_STATUS_TTL_SECONDS, job_channel(job_id)))
+        return self.redis.set_and_publish(entries)
+
+    def get(self, job_id: str) -> Optional[Dict[str, object]]:
+        value = self.redis.get(job_key(job_id))
+        return json.loads(value) if value else None
+
+
+class JobLeases:
+    """
+    In-flight leases for transformation jobs, so a derivative is only queued once.
+
+    The API takes the lease (SET NX with JOB_LEASE_SECONDS) before sending a job and
+    skips the send if another request holds it; the worker extends it while working
+    and releases it when the job is done or has failed. Without Redis every
+    acquisition succeeds, i.e. duplicates are sent as before.
+    """
+    def __init__(self, redis: RedisAdapter):
+        self.redis = redis
+
+    def acquire(self, job_ids: List[str]) -> List[str]:
+        """Takes the leases that are free; returns the ids whose lease was acquired."""
+        acquired = self.redis.set_if_absent_many(
+            [(lease_key(job_id), "1", settings.JOB_LEASE_SECONDS) for job_id in job_ids]
+        )
+        if acquired is None:
+            return list(job_ids)
+        return [job_id for job_id, ok in zip(job_ids, acquired) if ok]
+
+    def extend(self, job_id: str) -> bool:
+        return self.redis.expire(lease_key(job_id), settings.JOB_LEASE_SECONDS)
+
+    def release(self, job_ids: List[str]) -> None:
+        self.redis.delete(*[lease_key(job_id) for job_id in job_ids])
+
+
+class JobStatusHub:
+    """
+    Fans job state events out to the requests waiting on them.
+
+    One Redis pub/sub connection per process: a channel is subscribed while at least
+    one request waits on that job and unsubscribed after the last one leaves. A single
+    listener task hands every message to the waiters' queues. If Redis is unreachable
+    at startup or the connection drops later, the listener reconnects with exponential
+    backoff (up to JOB_STATUS_HUB_RECONNECT_MAX_SECONDS), resubscribes the waiters'
+    channels and puts RESYNC_EVENT in their queues, since events may have been missed.
+    """
+    def __init__(self):
+        self._client: Optional[aioredis.Redis] = None
+        self._pubsub = None
+        self._waiters: Dict[str, Set[asyncio.Queue]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        # First attempt inline, so waiters can subscribe from the first request
+        if not await self._connect():
+            print("WARNING: Job status hub could not subscribe to Redis. Waiting clients will poll the database until it reconnects.")
+        self._listener = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._disconnect()
+
+    def is_available(self) -> bool:
+        return self._pubsub is not None and self._listener is not None and not self._listener.done()
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator[Optional[asyncio.Queue]]:
+        """
+        Queue receiving the job's state events (dicts) while the context is open,
+        or None if the hub is not connected.
+        """
+        if not self.is_available():
+            yield None
+            return
+
+        channel = job_channel(job_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        waiters = self._waiters.setdefault(channel, set())
+        first = not waiters
+        waiters.add(queue)
+        try:
+            if first:
+                try:
+                    await self._pubsub.subscribe(channel)
+                except Exception as e:
+                    # Subscribed again (and the waiter resynced) when the listener reconnects
+                    print(f"Job status hub: subscribe to {channel} failed: {e}")
+            yield queue
+        finally:
+            waiters.discard(queue)
+            if not waiters and self._waiters.get(channel) is waiters:
+                del self._waiters[channel]
+                try:
+                    if self._pubsub is not None:
+                        await self._pubsub.unsubscribe(channel)
+                except Exception as e:
+                    print(f"Job status hub: unsubscribe from {channel} failed: {e}")
+
+    async def _connect(self) -> bool:
+        client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+        pubsub = client.pubsub()
+        try:
+            await client.ping()
+            # The listener needs a live subscription before it can read; this channel is never published to
+            await pubsub.subscribe(job_channel("_hub"), *self._waiters)
+        except Exception as e:
+            print(f"Job status hub: could not connect to Redis: {e}")
+            await self._close_client(client, pubsub)
+            return False
+        self._client = client
+        self._pubsub = pubsub
+        return True
+
+    async def _disconnect(self) -> None:
+        client, pubsub = self._client, self._pubsub
+        self._client = None
+        self._pubsub = None
+        if client is not None:
+            await self._close_client(client, pubsub)
+
+    @staticmethod
+    async def _close_client(client: aioredis.Redis, pubsub) -> None:
+        try:
+            await pubsub.aclose()
+            await client.aclose()
+        except Exception as e:
+            print(f"Job status hub close failed: {e}")
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            if self._pubsub is None:
+                await asyncio.sleep(delay)
+                if not await self._connect():
+                    delay = min(delay * 2, settings.JOB_STATUS_HUB_RECONNECT_MAX_SECONDS)
+                    continue
+                print("Job status hub reconnected to Redis.")
+                for queues in self._waiters.values():
+                    for queue in queues:
+                        queue.put_nowait(RESYNC_EVENT)
+            delay = 1.0
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job status hub: pub/sub connection lost: {e}")
+            await self._disconnect()
+
+    async def _listen(self) -> None:
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is None or message.get("type") != "message":
+                continue
+            try:
+                event = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            for queue in self._waiters.get(message["channel"], ()):
+                queue.put_nowait(event)
@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from io import BytesIO
+from typing import Tuple, Optional, BinaryIO
+from urllib.parse import quote
+from app.core.config import settings
+from app.core.exceptions import UploadTooLargeError
+from app.infrastructure.adapters.storage_service import StorageService, HashingReader, stream_size
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalFileStorageService(StorageService):
+    """
+    Stores images on the local filesystem under settings.STORAGE_PATH.
+
+    Objects are sharded into two levels of directories derived from a hash of the
+    storage_url, and every write goes to a temp file in the target directory that is
+    atomically renamed into place. Downloads are served by the API itself through
+    HMAC-signed, expiring URLs (see `verify_signature`).
+    """
+    def __init__(self):
+        self.storage_root = settings.STORAGE_PATH
+        self.connect()
+
+    def connect(self) -> bool:
+        try:
+            os.makedirs(self.storage_root, exist_ok=True)
+        except OSError as e:
+            print(f"WARNING: Local storage directory {self.storage_root} is not usable. Error: {e}")
+        return self.is_available()
+
+    def is_available(self) -> bool:
+        return os.path.isdir(self.storage_root)
+
+    def health_check(self) -> bool:
+        return self.is_available() and os.access(self.storage_root, os.W_OK)
+
+    def close(self) -> None:
+        pass
+
+    # --- Paths ---
+
+    def local_path(self, storage_url: str) -> str:
+        """Sharded on-disk location of an object: {root}/ab/cd/{digest}{extension}."""
+        digest = hashlib.sha1(storage_url.encode("utf-8")).hexdigest()
+        extension = os.path.splitext(storage_url)[1]
+        return os.path.join(self.storage_root, digest[:2], digest[2:4], f"{digest}{extension}")
+
+    def _atomic_write(self, storage_url: str, source: BinaryIO) -> None:
+        """Copies `source` to a temp file next to the target and renames it into place."""
+        path = self.local_path(storage_url)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                shutil.copyfileobj(source, tmp, COPY_CHUNK_SIZE)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    # --- StorageService ---
+
+    def upload_stream(self, stream: BinaryIO, user_id: int, filename: str, content_type: Optional[str] = None) -> Tuple[str, str, int, str]:
+        """
+        Streams an upload spool to disk.
+        Returns (image_id, storage_url, size_bytes, sha256 hex digest).
+        """
+        image_id = str(uuid.uuid4())
+        storage_url = self._get_object_path(user_id, image_id, filename)
+
+        size_bytes, content_hash = self._stream_write(stream, storage_url)
+        return image_id, storage_url, size_bytes, content_hash
+
+    def _stream_write(self, stream: BinaryIO, storage_url: str) -> Tuple[int, str]:
+        stream.seek(0)
+        if stream_size(stream) > settings.MAX_UPLOAD_SIZE_BYTES:
+            raise UploadTooLargeError()
+
+        reader = HashingReader(stream, max_bytes=settings.MAX_UPLOAD_SIZE_BYTES)
+        self._atomic_write(storage_url, reader)
+        return reader.size, reader.hexdigest()
+
+    def save_transformed_image(self, image_data: bytes, user_id: int, original_filename: str, new_id: str, content_type: Optional[str] = None) -> str:
+        storage_url = self._get_object_path(user_id, new_id, original_filename)
+        self._atomic_write(storage_url, BytesIO(image_data))
+        return storage_url
+
+    def download_image(self, storage_url: str) -> bytes:
+        path = self.local_path(storage_url)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Image object not found at local path: {storage_url}")
+        with open(path, "rb") as f:
+            return f.read()
+
+    def delete_image(self, storage_url: str) -> None:
+        try:
+            os.unlink(self.local_path(storage_url))
+        except FileNotFoundError:
+            pass
+
+    # --- Signed URLs ---
+
+    def _sign(self, storage_url: str, expires: int) -> str:
+        message = f"{storage_url}:{expires}".encode("utf-8")
+        return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+    def generate_signed_url(self, storage_url: str) -> str:
+        """Returns an expiring API URL that serves the file without further authentication."""
+        expires = int(time.time()) + settings.GCS_SIGNED_URL_EXPIRATION_SECONDS
+        signature = self._sign(storage_url, expires)
+        return f"{settings.API_V1_STR}/images/files/{quote(storage_url)}?expires={expires}&signature={signature}"
+
+    def verify_signature(self, storage_url: str, expires: int, signature: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._sign(storage_url, expires), signature)
@@ -1,21 +1,47 @@
 import json
+import threading
+from typing import Callable, List, Optional, Tuple
 from kafka import KafkaProducer, errors
 from app.core.config import settings
+from app.core.exceptions import QueueBackpressureError
 from app.domain.entities.image import Transformation
 
 
 class KafkaProducerAdapter:
+    """
+    Non-blocking producer for transformation requests.
+
+    Sends are only appended to the client's local batch buffer; the background
+    sender thread ships them after KAFKA_LINGER_MS or once a batch is full.
+    Delivery is reported through callbacks, and the buffer is flushed on close().
+    """
 
     def __init__(self):
+        self.producer = None
+        self.topic = settings.KAFKA_TRANSFORMATION_TOPIC
+
+        # Messages handed to the producer but not yet acknowledged (or failed)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+        self.connect()
+
+    def connect(self) -> bool:
+        """
+        (Re)creates the producer. Constructing it bootstraps the cluster metadata,
+        so no test message has to be sent to know the brokers are reachable.
+        """
         try:
             self.producer = KafkaProducer(
-                bootstrap_servers = settings.KAFKA_TRANSFORMATION_TOPIC.split('.'),
+                bootstrap_servers = settings.KAFKA_BOOTSTRAP_SERVERS.split(','),
                 value_serializer = lambda v : json.dumps(v).encode('utf-8'),
                 api_version = (0, 10, 1),
-                retries = 3
+                retries = 3,
+                linger_ms = settings.KAFKA_LINGER_MS,
+                batch_size = settings.KAFKA_BATCH_SIZE,
+                # Upper bound on how long send() may block waiting for topic metadata
+                max_block_ms = settings.KAFKA_MAX_BLOCK_MS
             )
-
-            self.producer.send(settings.KAFKA_TRANSFORMATION_TOPIC, value = {"message": "System check"}).get(timeout = 5)
             print("Kafka Producer connected successfully.")
         
         except errors.NoBrokersAvailable:
@@ -25,11 +51,44 @@ class KafkaProducerAdapter:
             print(f"WARNING: Kafka connection failed: {e}. Image transformation requests will fail.")
             self.producer = None
 
-        self.topic = settings.KAFKA_TRANSFORMATION_TOPIC
+        return self.is_available()
 
-    def send_transformation_request(self, original_image_id: str, new_image_id: str, transformation: Transformation, user_id: int):
+    def is_available(self) -> bool:
+        return self.producer is not None
+
+    def health_check(self) -> bool:
+        """True while the producer holds a connection to at least one bootstrap broker."""
+        if not self.is_available(): return False
+        try:
+            return self.producer.bootstrap_connected()
+        except Exception as e:
+            print(f"Kafka health check failed: {e}")
+            return False
+
+    def close(self) -> None:
+        """Flushes buffered messages and closes the producer."""
+        if self.producer is not None:
+            try:
+                self.producer.flush()
+                self.producer.close()
+            except Exception as e:
+                print(f"Kafka producer close failed: {e}")
+        self.producer = None
+
+    def send_transformation_request(
+        self,
+        original_image_id: str,
+        new_image_id: str,
+        transformations: Transformation,
+        user_id: int,
+        on_delivery: Optional[Callable[[Optional[Exception]], None]] = None
+    ):
         """
-        Sends a request to the transformation topic.
+        Enqueues a request on the transformation topic and returns immediately.
+
+        Returns the client's delivery future. `on_delivery` is called from the
+        producer's sender thread with None on success or the exception on failure.
+        Raises QueueBackpressureError when too many messages are still undelivered.
         """
 
         if not self.producer: 
@@ -39,9 +98,69 @@ class KafkaProducerAdapter:
             "original_id": original_image_id,
             "new_id": new_image_id,
             "user_id": user_id,
-            "transformations": transformations.model_dump(exclude_none = True),
+            "transformations": transformations.canonical(),
         }
 
-        future = self.producer.send(self.topic, value = message)
-        self.producer.flush()
-        return future
\ No newline at end of file
+        # Keyed by original so all variants of an image land on the same partition
+        return self._send(message, key = original_image_id, on_delivery = on_delivery)
+
+    def send_variant_ladder(
+        self,
+        original_image_id: str,
+        variants: List[Tuple[str, Transformation]],
+        user_id: int,
+        on_delivery: Optional[Callable[[Optional[Exception]], None]] = None
+    ):
+        """
+        Enqueues one request for several derivatives of the same original, given as
+        (new image id, transformation) pairs. The worker renders them together.
+        `on_delivery` is called as for send_transformation_request.
+        """
+
+        if not self.producer: 
+            raise ConnectionError("Kafka is not available. Cannot process asynchronous transformation.")
+
+        message = {
+            "original_id": original_image_id,
+            "user_id": user_id,
+            "variants": [
+                {"new_id": new_image_id, "transformations": transformations.canonical()}
+                for new_image_id, transformations in variants
+            ],
+        }
+        return self._send(message, key = original_image_id, on_delivery = on_delivery)
+
+    def _send(self, message: dict, key: str, on_delivery: Optional[Callable[[Optional[Exception]], None]] = None):
+        with self._pending_lock:
+            if self._pending >= settings.KAFKA_MAX_PENDING_MESSAGES:
+                raise QueueBackpressureError()
+            self._pending += 1
+
+        try:
+            future = self.producer.send(self.topic, key = key.encode('utf-8'), value = message)
+        except errors.KafkaTimeoutError:
+            # Metadata for the topic could not be fetched within max_block_ms
+            self._release()
+            raise QueueBackpressureError()
+        except Exception:
+            self._release()
+            raise
+
+        def _on_success(_metadata):
+            self._release()
+            if on_delivery:
+                on_delivery(None)
+
+        def _on_error(exc):
+            self._release()
+            print(f"Kafka delivery failed for {message.get('new_id') or message['original_id']}: {exc}")
+            if on_delivery:
+                on_delivery(exc)
+
+        future.add_callback(_on_success)
+        future.add_errback(_on_error)
+        return future
+
+    def _release(self) -> None:
+        with self._pending_lock:
+            self._pending -= 1
\ No newline at end of file
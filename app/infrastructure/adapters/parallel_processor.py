@@ -0,0 +1,207 @@
+import io
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from PIL import Image as PILImage
+from app.domain.entities.image import Transformation
+from app.infrastructure.adapters.image_processor import ImageProcessorAdapter
+
+# Decoded pixels are budgeted at this many bytes per pixel (RGBA, the widest working mode)
+BYTES_PER_PIXEL = 4
+
+# Per-variant result: the rendered bytes, or the exception rendering raised
+RenderResult = Union[bytes, Exception]
+
+
+class SharedBufferReader(io.RawIOBase):
+    """Read-only, seekable file object over a buffer, so Pillow can decode shared memory in place."""
+    def __init__(self, buffer: Any):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target: Any) -> int:
+        count = max(0, min(len(target), len(self._view) - self._position))
+        target[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        # The view must be released before the shared memory segment can be closed
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def estimate_decoded_bytes(image_data: bytes) -> int:
+    """Upper bound on the pixel memory decoding the image takes, read from its header alone."""
+    with PILImage.open(io.BytesIO(image_data)) as img:
+        return img.width * img.height * BYTES_PER_PIXEL
+
+
+class ParallelImageProcessor:
+    """
+    Renders many images across a pool of processes.
+
+    Inputs and outputs travel through multiprocessing.shared_memory segments: the
+    children decode straight from the input segment and write the encoded result
+    into a new one, so large images are never pickled through the pool's pipes.
+    Admission is limited by a budget on the decoded pixel memory of the images in
+    progress (estimated from their headers), shared by every caller of this instance;
+    an image larger than the whole budget runs on its own.
+    """
+    def __init__(self, max_workers: int, memory_budget_bytes: int, mp_context: Optional[Any] = None):
+        self.max_workers = max_workers
+        self.memory_budget_bytes = memory_budget_bytes
+        # "spawn" keeps the host's sockets and background threads out of the children
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp_context or multiprocessing.get_context("spawn")
+        )
+        self._reserved = 0
+        self._budget = threading.Condition()
+
+    def process_many(self, items: Sequence[Tuple[bytes, Sequence[Transformation]]]) -> List[List[RenderResult]]:
+        """
+        Renders every (image bytes, transformations) item; each image is decoded once for
+        all of its transformations (see ImageProcessorAdapter.process_variants).
+        Returns, in input order, one result per transformation of each item: the output
+        bytes, or the exception that rendering it raised.
+        """
+        results: List[Optional[List[RenderResult]]] = [None] * len(items)
+        submitted: List[Tuple[int, Future, SharedMemory]] = []
+        collected = set()
+        try:
+            for index, (image_data, variants) in enumerate(items):
+                try:
+                    cost = estimate_decoded_bytes(image_data)
+                except Exception as e:
+                    results[index] = [e] * len(variants)
+                    continue
+
+                self._reserve(cost)
+                segment = None
+                try:
+                    segment = SharedMemory(create=True, size=max(1, len(image_data)))
+                    segment.buf[:len(image_data)] = image_data
+                    future = self._pool.submit(
+                        _render_shared, segment.name, len(image_data), [t.model_dump() for t in variants]
+                    )
+                except BaseException:
+                    self._release(cost)
+                    if segment is not None:
+                        segment.close()
+                        segment.unlink()
+                    raise
+                future.add_done_callback(lambda _, cost=cost: self._release(cost))
+                submitted.append((index, future, segment))
+
+            for index, future, segment in submitted:
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    results[index] = [e] * len(items[index][1])
+                    continue
+                collected.add(index)
+                results[index] = _collect(outputs)
+        finally:
+            for index, future, segment in submitted:
+                # Left early: outputs nobody collected are freed once the child has written them
+                if index not in collected and not future.cancel():
+                    future.add_done_callback(_discard_outputs)
+                segment.close()
+                segment.unlink()
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _reserve(self, cost: int) -> None:
+        with self._budget:
+            while self._reserved and self._reserved + cost > self.memory_budget_bytes:
+                self._budget.wait()
+            self._reserved += cost
+
+    def _release(self, cost: int) -> None:
+        with self._budget:
+            self._reserved -= cost
+            self._budget.notify_all()
+
+
+def _collect(outputs: List[Union[Tuple[str, int], Exception]]) -> List[RenderResult]:
+    """Copies a child's outputs out of their shared memory segments; every segment is freed, even if a copy fails."""
+    try:
+        return [output if isinstance(output, Exception) else _read_output(*output) for output in outputs]
+    finally:
+        _free_outputs(outputs)
+
+
+def _read_output(name: str, size: int) -> bytes:
+    segment = SharedMemory(name=name)
+    try:
+        return bytes(segment.buf[:size])
+    finally:
+        segment.close()
+
+
+def _free_outputs(outputs: List[Union[Tuple[str, int], Exception]]) -> None:
+    for output in outputs:
+        if isinstance(output, Exception):
+            continue
+        try:
+            segment = SharedMemory(name=output[0])
+        except FileNotFoundError:
+            continue
+        segment.close()
+        segment.unlink()
+
+
+def _discard_outputs(future: Future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        _free_outputs(future.result())
+    except Exception as e:
+        print(f"ParallelImageProcessor: could not free abandoned outputs: {e}")
+
+
+# --- Executed in the pool's processes ---
+
+_processor = ImageProcessorAdapter()
+
+
+def _render_shared(name: str, size: int, variants: List[Dict[str, Any]]) -> List[Union[Tuple[str, int], Exception]]:
+    """Renders the image in segment `name`; each output goes into a new segment, returned as (name, size)."""
+    segment = SharedMemory(name=name)
+    reader = SharedBufferReader(segment.buf[:size])
+    try:
+        rendered = _processor.process_variants(reader, [Transformation(**variant) for variant in variants])
+    finally:
+        reader.close()
+        segment.close()
+
+    outputs: List[Union[Tuple[str, int], Exception]] = []
+    for output in rendered:
+        if isinstance(output, Exception):
+            outputs.append(output)
+            continue
+        target = SharedMemory(create=True, size=max(1, len(output)))
+        target.buf[:len(output)] = output
+        target.close()
+        outputs.append((target.name, len(output)))
+    return outputs
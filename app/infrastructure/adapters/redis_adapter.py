@@ -1,6 +1,36 @@
 import redis
 from app.core.config import settings
-from typing import Optional
+from typing import Optional, Tuple, List
+
+# Token bucket: refills continuously at ARGV[2] tokens/second up to ARGV[1] and takes
+# ARGV[3] tokens if available. Check and decrement happen atomically on the server, and
+# the server clock is used so API replicas with skewed clocks agree.
+# Returns {allowed, remaining tokens, seconds until the cost is available}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
 
 class RedisAdapter:
     """
@@ -9,21 +39,57 @@ class RedisAdapter:
     """
     def __init__(self):
         self._client: Optional[redis.StrictRedis] = None
-        
+        # Separate pool without response decoding, for binary values such as rendered images
+        self._binary_client: Optional[redis.StrictRedis] = None
+        self._token_bucket = None
+        self.connect()
+
+    def connect(self) -> bool:
+        """(Re)creates the client and its connection pool. Returns True on a successful PING."""
         try:
-            self._client = redis.StrictRedis(
+            client = redis.StrictRedis(
                 host=settings.REDIS_HOST, 
                 port=settings.REDIS_PORT, 
                 decode_responses=True
             )
-            self._client.ping()
+            client.ping()
+            self._binary_client = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            # Runs via EVALSHA, falling back to EVAL (and caching the script) on NOSCRIPT
+            self._token_bucket = client.register_script(TOKEN_BUCKET_SCRIPT)
+            self._client = client
             print("Redis Adapter: Connection successful.")
         except redis.exceptions.ConnectionError as e:
             print(f"WARNING: Redis connection failed at {settings.REDIS_HOST}:{settings.REDIS_PORT}. Redis functionality disabled. Error: {e}")
             self._client = None
+            self._binary_client = None
+            self._token_bucket = None
+        return self.is_available()
             
     def is_available(self) -> bool:
         return self._client is not None
+
+    def health_check(self) -> bool:
+        """PINGs the server. The pool reconnects on its own, so a failed PING does not drop the client."""
+        if not self.is_available(): return False
+        try:
+            return bool(self._client.ping())
+        except Exception as e:
+            print(f"Redis health check failed: {e}")
+            return False
+
+    def close(self) -> None:
+        """Disconnects every pooled connection."""
+        for client in (self._client, self._binary_client):
+            if client is None:
+                continue
+            try:
+                client.close()
+                client.connection_pool.disconnect()
+            except Exception as e:
+                print(f"Redis close failed: {e}")
+        self._client = None
+        self._binary_client = None
+        self._token_bucket = None
         
     def get_client(self) -> redis.StrictRedis:
         if not self.is_available():
@@ -48,6 +114,123 @@ class RedisAdapter:
             print(f"Redis SET error for key {key}: {e}")
             return False
             
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """Retrieves many values in one round trip; missing keys (or an unavailable Redis) give None."""
+        if not keys: return []
+        if not self.is_available(): return [None] * len(keys)
+        try:
+            return self._client.mget(keys)
+        except Exception as e:
+            print(f"Redis MGET error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+
+    def set_many(self, entries: List[Tuple[str, str, int]]) -> bool:
+        """Sets many (key, value, ttl) entries in one pipelined round trip."""
+        if not entries: return True
+        if not self.is_available(): return False
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, value, ttl in entries:
+                pipe.setex(key, ttl, value)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis pipelined SET error for {len(entries)} keys: {e}")
+            return False
+
+    def set_and_publish(self, entries: List[Tuple[str, str, int, str]]) -> bool:
+        """Sets many (key, value, ttl) entries and publishes each value on its channel, in one round trip."""
+        if not entries: return True
+        if not self.is_available(): return False
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, value, ttl, channel in entries:
+                pipe.setex(key, ttl, value)
+                pipe.publish(channel, value)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis SET/PUBLISH error for {len(entries)} keys: {e}")
+            return False
+
+    def set_if_absent_many(self, entries: List[Tuple[str, str, int]]) -> Optional[List[bool]]:
+        """
+        SET NX with a TTL for many (key, value, ttl) entries in one round trip.
+        Returns whether each key was set (False if it already existed), or None if Redis is unavailable.
+        """
+        if not entries: return []
+        if not self.is_available(): return None
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, value, ttl in entries:
+                pipe.set(key, value, ex=ttl, nx=True)
+            return [bool(result) for result in pipe.execute()]
+        except Exception as e:
+            print(f"Redis SET NX error for {len(entries)} keys: {e}")
+            return None
+
+    def expire(self, key: str, ttl: int) -> bool:
+        """(Re)sets a key's Time-To-Live in seconds; False if the key does not exist."""
+        if not self.is_available(): return False
+        try:
+            return bool(self._client.expire(key, ttl))
+        except Exception as e:
+            print(f"Redis EXPIRE error for key {key}: {e}")
+            return False
+
+    def delete(self, *keys: str) -> int:
+        """Deletes keys; returns how many existed."""
+        if not keys or not self.is_available(): return 0
+        try:
+            return self._client.delete(*keys)
+        except Exception as e:
+            print(f"Redis DEL error for {len(keys)} keys: {e}")
+            return 0
+
+    def add_to_set(self, key: str, member: str, ttl: int) -> bool:
+        """Adds a member to a set and (re)sets the set's Time-To-Live in seconds."""
+        if not self.is_available(): return False
+        try:
+            pipe = self._client.pipeline()
+            pipe.sadd(key, member)
+            pipe.expire(key, ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"Redis SADD error for key {key}: {e}")
+            return False
+
+    def pop_set(self, key: str) -> List[str]:
+        """Atomically reads and deletes a whole set."""
+        if not self.is_available(): return []
+        try:
+            pipe = self._client.pipeline()
+            pipe.smembers(key)
+            pipe.delete(key)
+            members, _ = pipe.execute()
+            return list(members)
+        except Exception as e:
+            print(f"Redis SMEMBERS error for key {key}: {e}")
+            return []
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Retrieves a binary value by key."""
+        if not self.is_available(): return None
+        try:
+            return self._binary_client.get(key)
+        except Exception as e:
+            print(f"Redis GET error for key {key}: {e}")
+            return None
+
+    def set_bytes(self, key: str, value: bytes, ttl: int) -> bool:
+        """Stores a binary value with a Time-To-Live (TTL) in seconds."""
+        if not self.is_available(): return False
+        try:
+            return self._binary_client.setex(key, ttl, value)
+        except Exception as e:
+            print(f"Redis SET error for key {key}: {e}")
+            return False
+            
     def incr_and_expire(self, key: str, period: int) -> Optional[int]:
         """Atomically increments a key and sets its expiration if it's new. Returns the new count."""
         if not self.is_available(): return None
@@ -62,6 +245,19 @@ class RedisAdapter:
             print(f"Redis INCR/EXPIRE pipeline failed for key {key}: {e}")
             return None
 
+    def consume_tokens(self, key: str, capacity: int, refill_per_second: float, cost: int = 1) -> Optional[Tuple[bool, float, float]]:
+        """
+        Atomically takes `cost` tokens from the bucket at `key`.
+        Returns (allowed, remaining tokens, retry after seconds), or None if Redis is unavailable.
+        """
+        if not self.is_available(): return None
+        try:
+            allowed, remaining, retry_after = self._token_bucket(keys=[key], args=[capacity, refill_per_second, cost])
+            return bool(allowed), float(remaining), float(retry_after)
+        except Exception as e:
+            print(f"Redis token bucket failed for key {key}: {e}")
+            return None
+
     def ttl(self, key: str) -> Optional[int]:
         """Returns the remaining time to live of a key in seconds."""
         if not self.is_available(): return None
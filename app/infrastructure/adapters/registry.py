@@ -0,0 +1,144 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from app.core.cache import ByteLRUCache, AsyncSingleFlight, TTLCache, SingleFlight
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+from app.core.principals import PrincipalCache
+from app.infrastructure.adapters.storage_service import StorageService, GoogleCloudStorageService
+from app.infrastructure.adapters.local_storage import LocalFileStorageService
+from app.infrastructure.adapters.message_queue import KafkaProducerAdapter
+from app.infrastructure.adapters.redis_adapter import RedisAdapter
+from app.infrastructure.adapters.async_adapters import AsyncStorageService, AsyncTransformationQueue
+from app.infrastructure.adapters.job_status import JobStatusHub
+
+
+def create_storage_service() -> StorageService:
+    """Builds the storage backend selected by settings.STORAGE_BACKEND."""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalFileStorageService()
+    return GoogleCloudStorageService()
+
+
+class AdapterRegistry:
+    """
+    Process-wide owner of the external service adapters (storage, Kafka, Redis).
+
+    Adapters are built once when the application starts and shared by every request.
+    A background task periodically checks their health and reconnects the ones whose
+    client could not be created; everything is closed when the application stops.
+    """
+    def __init__(self):
+        self.storage: Optional[StorageService] = None
+        self.producer: Optional[KafkaProducerAdapter] = None
+        self.redis: Optional[RedisAdapter] = None
+        # Awaitable views of storage and Kafka for request handlers, each on its own bounded executor
+        self.storage_io: Optional[AsyncStorageService] = None
+        self.queue_io: Optional[AsyncTransformationQueue] = None
+        self.storage_executor = BoundedExecutor("storage-io", settings.STORAGE_IO_WORKERS, settings.STORAGE_IO_MAX_QUEUE)
+        self.queue_executor = BoundedExecutor("queue-io", settings.QUEUE_IO_WORKERS, settings.QUEUE_IO_MAX_QUEUE)
+
+        # In-process state for synchronous rendering
+        self.render_cache = ByteLRUCache(settings.RENDER_CACHE_MAX_BYTES, max_item_bytes=settings.RENDER_CACHE_MAX_BYTES // 16)
+        self.render_flights = AsyncSingleFlight()
+        self.render_executor = BoundedExecutor("render", settings.RENDER_WORKERS, settings.RENDER_MAX_QUEUE)
+
+        # In-process (L1) caches for image retrieval: signed URLs by object, owners by image id
+        self.url_cache = TTLCache(settings.IMAGE_URL_L1_MAX_ENTRIES)
+        self.owner_cache = TTLCache(settings.IMAGE_URL_L1_MAX_ENTRIES)
+        self.url_flights = SingleFlight()
+        self.url_load_flights = AsyncSingleFlight()
+        self.principals: Optional[PrincipalCache] = None
+        # Password hashing (bcrypt) for the auth endpoints, isolated from everything else
+        self.auth_executor = BoundedExecutor("auth-hash", settings.AUTH_HASH_WORKERS, settings.AUTH_HASH_MAX_QUEUE)
+        self.signing_pool = ThreadPoolExecutor(max_workers=settings.IMAGE_URL_SIGNING_WORKERS, thread_name_prefix="url-signing")
+        # Transformation job events for requests waiting on a derivative (long poll / SSE)
+        self.jobs = JobStatusHub()
+
+        self._health: Dict[str, Dict[str, Any]] = {}
+        self._monitor_task: Optional[asyncio.Task] = None
+
+    def _adapters(self) -> Dict[str, Any]:
+        return {"storage": self.storage, "kafka": self.producer, "redis": self.redis}
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        """Builds all adapters concurrently off the event loop and starts the health monitor."""
+        self.storage, self.producer, self.redis = await asyncio.gather(
+            asyncio.to_thread(create_storage_service),
+            asyncio.to_thread(KafkaProducerAdapter),
+            asyncio.to_thread(RedisAdapter),
+        )
+        self.principals = PrincipalCache(self.redis)
+        self.storage_io = AsyncStorageService(self.storage, self.storage_executor)
+        self.queue_io = AsyncTransformationQueue(self.producer, self.queue_executor)
+        await self.jobs.start()
+        await self.check_health(reconnect=False)
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def close(self) -> None:
+        """Stops the health monitor and closes every adapter (flushing pending Kafka messages)."""
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+
+        await self.jobs.close()
+
+        for executor in self._executors():
+            await asyncio.to_thread(executor.shutdown)
+        await asyncio.to_thread(self.signing_pool.shutdown)
+
+        for name, adapter in self._adapters().items():
+            if adapter is None:
+                continue
+            try:
+                await asyncio.to_thread(adapter.close)
+            except Exception as e:
+                print(f"AdapterRegistry: failed to close {name}: {e}")
+
+    # --- Health ---
+
+    async def check_health(self, reconnect: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Runs every adapter's health check, optionally reconnecting adapters that have no live client."""
+        for name, adapter in self._adapters().items():
+            if adapter is None:
+                continue
+            state = self._health.setdefault(name, {"healthy": False, "reconnects": 0})
+            try:
+                if reconnect and not adapter.is_available():
+                    state["reconnects"] += 1
+                    await asyncio.to_thread(adapter.connect)
+                healthy = await asyncio.to_thread(adapter.health_check)
+                state["error"] = None
+            except Exception as e:
+                healthy = False
+                state["error"] = str(e)
+            state["healthy"] = healthy
+            state["checked_at"] = time.time()
+        return self.health()
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(state) for name, state in self._health.items()}
+
+    def _executors(self) -> List[BoundedExecutor]:
+        return [self.render_executor, self.auth_executor, self.storage_executor, self.queue_executor]
+
+    def executor_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {executor.name: executor.stats() for executor in self._executors()}
+
+    def is_healthy(self) -> bool:
+        return bool(self._health) and all(state["healthy"] for state in self._health.values())
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ADAPTER_HEALTH_CHECK_INTERVAL_SECONDS)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"AdapterRegistry: health check failed: {e}")
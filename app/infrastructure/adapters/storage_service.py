@@ -1,65 +1,203 @@
+import hashlib
 import os
 import uuid
-from fastapi import UploadFile
+from abc import ABC, abstractmethod
 from app.core.config import settings
-from typing import Tuple
+from app.core.exceptions import UploadTooLargeError
+from typing import Tuple, Optional, BinaryIO
+from google.api_core.exceptions import NotFound
 from google.cloud import storage 
 from datetime import timedelta
 
-class GoogleCloudStorageService:
+
+class HashingReader:
+    """
+    Read-only stream wrapper that hashes and counts bytes as they are consumed.
+
+    Raises UploadTooLargeError as soon as more than `max_bytes` have been read, so an
+    oversized upload is aborted mid-stream. Re-reads after a backwards seek (e.g. a
+    resumable upload recovering a chunk) are not hashed twice.
+    """
+    def __init__(self, stream: BinaryIO, max_bytes: Optional[int] = None):
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._hasher = hashlib.sha256()
+        self._hashed_upto = 0
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._stream.tell()
+        data = self._stream.read(size)
+        end = start + len(data)
+        if self._max_bytes is not None and end > self._max_bytes:
+            raise UploadTooLargeError()
+        if end > self._hashed_upto:
+            self._hasher.update(data[self._hashed_upto - start:] if start < self._hashed_upto else data)
+            self._hashed_upto = end
+        return data
+
+    def tell(self) -> int:
+        return self._stream.tell()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._stream.seek(offset, whence)
+
+    @property
+    def size(self) -> int:
+        return self._hashed_upto
+
+    def hexdigest(self) -> str:
+        return self._hasher.hexdigest()
+
+
+def stream_size(stream: BinaryIO) -> int:
+    """Size of a seekable stream (e.g. the UploadFile spool) without reading it."""
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+def hash_stream(stream: BinaryIO, max_bytes: Optional[int] = None, chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """Returns (size, sha256 hex digest) of a seekable stream, reading it in chunks and rewinding it."""
+    stream.seek(0)
+    reader = HashingReader(stream, max_bytes=max_bytes)
+    while reader.read(chunk_size):
+        pass
+    stream.seek(0)
+    return reader.size, reader.hexdigest()
+
+
+class StorageService(ABC):
+    """
+    Interface implemented by every storage backend.
+    `storage_url` is always the backend-relative object path (e.g. '1/uuid.jpg').
+    """
+
+    @abstractmethod
+    def connect(self) -> bool: ...
+
+    @abstractmethod
+    def is_available(self) -> bool: ...
+
+    @abstractmethod
+    def health_check(self) -> bool: ...
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+    @abstractmethod
+    def upload_stream(self, stream: BinaryIO, user_id: int, filename: str, content_type: Optional[str] = None) -> Tuple[str, str, int, str]:
+        """
+        Stores an upload spool. Blocking; async callers go through AsyncStorageService.
+        Returns (image_id, storage_url, size_bytes, sha256 hex digest).
+        """
+
+    @abstractmethod
+    def save_transformed_image(self, image_data: bytes, user_id: int, original_filename: str, new_id: str, content_type: Optional[str] = None) -> str:
+        """Returns the storage_url of the saved image."""
+
+    @abstractmethod
+    def download_image(self, storage_url: str) -> bytes: ...
+
+    @abstractmethod
+    def generate_signed_url(self, storage_url: str) -> str: ...
+
+    @abstractmethod
+    def delete_image(self, storage_url: str) -> None:
+        """Removes the object; a missing object is not an error."""
+
+    @staticmethod
+    def _get_object_path(user_id: int, file_id: str, filename: str) -> str:
+        """Object path shared by all backends: {user_id}/{file_id}{extension}."""
+        file_extension = os.path.splitext(filename)[1]
+        return f"{user_id}/{file_id}{file_extension}"
+
+
+class GoogleCloudStorageService(StorageService):
     """
     Implements actual Google Cloud Storage interactions.
     storage_url now represents the GCS object path (e.g., '1/uuid.jpg').
     """
     def __init__(self):
         self.bucket_name = settings.GCS_BUCKET_NAME
-        
+        self.client = None
+        self.bucket = None
+        self.storage_root = settings.STORAGE_PATH 
+
+        self.connect()
+
+    def connect(self) -> bool:
+        """(Re)creates the GCS client. Returns True if the bucket handle is usable."""
         try:
-            self.client = storage.Client()
-            self.bucket = self.client.bucket(self.bucket_name)
+            client = storage.Client()
+            self.bucket = client.bucket(self.bucket_name)
+            self.client = client
             print(f"GCS Client connected to bucket: {self.bucket_name}")
         except Exception as e:
             print(f"WARNING: GCS client initialization failed. Please check credentials and bucket name. Error: {e}")
             self.client = None
             self.bucket = None
-            
-        self.storage_root = settings.STORAGE_PATH 
+        return self.is_available()
+
+    def is_available(self) -> bool:
+        return self.bucket is not None
+
+    def health_check(self) -> bool:
+        # Credentials and bucket are only validated on first use; avoid a network call here
+        return self.is_available()
+
+    def close(self) -> None:
+        """Releases the client's HTTP session."""
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception as e:
+                print(f"GCS client close failed: {e}")
+        self.client = None
+        self.bucket = None
 
     def _get_gcs_path(self, user_id: int, file_id: str, filename: str) -> str:
         """Helper to generate the object path (blob name) in GCS format."""
-        file_extension = os.path.splitext(filename)[1]
         # GCS path structure: {user_id}/{file_id}{extension}
-        return f"{user_id}/{file_id}{file_extension}"
+        return self._get_object_path(user_id, file_id, filename)
 
-    async def upload_image(self, file: UploadFile, user_id: int) -> Tuple[str, str, int]:
+    def upload_stream(self, stream: BinaryIO, user_id: int, filename: str, content_type: Optional[str] = None) -> Tuple[str, str, int, str]:
         """
-        Uploads an image directly to GCS from an UploadFile object. 
-        Returns (image_id, storage_url/gcs_path, size_bytes).
+        Streams an image to GCS from an upload spool without loading it into memory.
+        Returns (image_id, storage_url/gcs_path, size_bytes, sha256 hex digest).
         """
         if not self.bucket:
              raise Exception("GCS not initialized. Cannot upload.")
              
         image_id = str(uuid.uuid4())
         
-        gcs_path = self._get_gcs_path(user_id, image_id, file.filename)
-        
-        blob = self.bucket.blob(gcs_path)
-        
-        file_data = await file.read()
-        size_bytes = len(file_data)
-        
-        await file.seek(0)
-        
-        blob.upload_from_string(
-            file_data, 
-            content_type=file.content_type
-        )
+        gcs_path = self._get_gcs_path(user_id, image_id, filename)
+
+        size_bytes, content_hash = self._stream_upload(stream, gcs_path, content_type)
         
         storage_url = gcs_path
         
-        return image_id, storage_url, size_bytes
+        return image_id, storage_url, size_bytes, content_hash
+
+    def _stream_upload(self, stream: BinaryIO, gcs_path: str, content_type: Optional[str]) -> Tuple[int, str]:
+        """
+        Copies the upload spool to GCS. Small files go in one multipart request; files above
+        GCS_RESUMABLE_THRESHOLD_BYTES use a resumable upload sent in GCS_UPLOAD_CHUNK_SIZE chunks,
+        so memory use stays bounded by the chunk size.
+        """
+        stream.seek(0)
+        total = stream_size(stream)
+        if total > settings.MAX_UPLOAD_SIZE_BYTES:
+            raise UploadTooLargeError()
+
+        chunk_size = settings.GCS_UPLOAD_CHUNK_SIZE if total > settings.GCS_RESUMABLE_THRESHOLD_BYTES else None
+        blob = self.bucket.blob(gcs_path, chunk_size=chunk_size)
+
+        reader = HashingReader(stream, max_bytes=settings.MAX_UPLOAD_SIZE_BYTES)
+        blob.upload_from_file(reader, content_type=content_type, size=total)
+
+        return reader.size, reader.hexdigest()
 
-    def save_transformed_image(self, image_data: bytes, user_id: int, original_filename: str, new_id: str) -> str:
+    def save_transformed_image(self, image_data: bytes, user_id: int, original_filename: str, new_id: str, content_type: Optional[str] = None) -> str:
         """
         Saves a transformed image from raw bytes to GCS. Used primarily by the worker.
         Returns the GCS path (storage_url) for the new image.
@@ -71,7 +209,7 @@ class GoogleCloudStorageService:
         
         blob = self.bucket.blob(gcs_path)
         
-        blob.upload_from_string(image_data) 
+        blob.upload_from_string(image_data, content_type=content_type)
             
         return gcs_path 
 
@@ -83,12 +221,21 @@ class GoogleCloudStorageService:
              raise Exception("GCS not initialized. Cannot download image.")
              
         blob = self.bucket.blob(storage_url)
-        
-        if not blob.exists():
+
+        # A single GET; a missing object comes back as 404 rather than being checked for first
+        try:
+            return blob.download_as_bytes()
+        except NotFound:
             raise FileNotFoundError(f"Image object not found at GCS path: {storage_url}")
-        
 
-        return blob.download_as_bytes()
+    def delete_image(self, storage_url: str) -> None:
+        if not self.bucket:
+             raise Exception("GCS not initialized. Cannot delete image.")
+
+        try:
+            self.bucket.blob(storage_url).delete()
+        except NotFound:
+            pass
         
     def generate_signed_url(self, storage_url: str) -> str:
         """
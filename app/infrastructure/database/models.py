@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, JSON, ForeignKey
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Boolean, JSON, ForeignKey, Index, DateTime
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -24,5 +25,36 @@ class ImageDB(Base):
     size_bytes = Column(Integer)
     image_metadata = Column(JSON) # RENAMED from 'metadata'
     is_transformed = Column(Boolean, default=False)
+    # SHA-256 of the original's bytes (for derivatives: of the original they were rendered from)
+    content_hash = Column(String(64), index=True)
+    # Transformation fingerprint; NULL for originals
+    variant_key = Column(String(32))
+    # Read from the header at upload (and from the output for derivatives); NULL for rows stored before
+    width = Column(Integer)
+    height = Column(Integer)
+    orientation = Column(Integer) # EXIF orientation (1-8), NULL without EXIF
+    frame_count = Column(Integer)
+    color_mode = Column(String(16)) # Pillow mode, e.g. "RGB", "RGBA", "P", "CMYK"
+    has_icc_profile = Column(Boolean)
+    # Set in Python (microsecond precision) so listing order is the same on every backend
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     
-    owner = relationship("UserDB", back_populates="images")
\ No newline at end of file
+    owner = relationship("UserDB", back_populates="images")
+
+    __table_args__ = (
+        # Finds an already rendered derivative of the same content, whoever uploaded it
+        Index("ix_images_content_variant", "content_hash", "variant_key"),
+        # Keyset pagination of a user's images, newest first
+        Index("ix_images_user_created", "user_id", "created_at", "id"),
+        # Finds images by size (e.g. originals too large to render inline)
+        Index("ix_images_dimensions", "width", "height"),
+    )
+
+class BlobDB(Base):
+    """One stored original per distinct content hash, shared by every image row with those bytes."""
+    __tablename__ = "blobs"
+
+    content_hash = Column(String(64), primary_key=True)
+    storage_url = Column(String, nullable=False)
+    size_bytes = Column(Integer)
+    ref_count = Column(Integer, nullable=False, default=1)
\ No newline at end of file
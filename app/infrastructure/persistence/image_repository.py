@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.infrastructure.database.models import ImageDB
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from sqlalchemy import func, tuple_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.infrastructure.database.models import ImageDB, BlobDB
 from app.domain.entities.image import Image
-from typing import List, Dict, Any, Optional # FIX: Added Optional import
+from typing import List, Dict, Any, Optional, Tuple # FIX: Added Optional import
 
 class ImageRepository:
     def __init__(self, db: Session):
@@ -22,14 +25,36 @@ class ImageRepository:
         self.db.refresh(db_image)
         return Image.model_validate(db_image)
 
-    def list_images_by_user(self, user_id: int, page: int, limit: int) -> List[Image]:
-        offset = (page - 1) * limit
+    def get_images_by_ids(self, image_ids: List[str], user_id: int) -> List[Image]:
+        """Fetches the given images owned by `user_id` in a single query; missing or foreign ids are omitted."""
+        if not image_ids:
+            return []
         db_images = (
             self.db.query(ImageDB)
-            .filter(ImageDB.user_id == user_id)
-            # Use indexed user_id for filtering and order by ID for stable pagination
-            .order_by(ImageDB.id.desc())
-            .offset(offset)
+            .filter(ImageDB.id.in_(set(image_ids)), ImageDB.user_id == user_id)
+            .all()
+        )
+        return [Image.model_validate(img) for img in db_images]
+
+    def bulk_create_images(self, images_data: List[Dict[str, Any]]) -> None:
+        """Inserts many image rows in one transaction."""
+        if not images_data:
+            return
+        self.db.add_all([ImageDB(**data) for data in images_data])
+        self.db.commit()
+
+    def list_images_by_user(self, user_id: int, limit: int, after: Optional[Tuple[datetime, str]] = None) -> List[Image]:
+        """
+        A user's images, newest first, starting after the (created_at, id) key `after`.
+        Keyset pagination on ix_images_user_created: every page is a bounded index range
+        scan, and rows inserted meanwhile do not shift later pages.
+        """
+        query = self.db.query(ImageDB).filter(ImageDB.user_id == user_id)
+        if after is not None:
+            query = query.filter(tuple_(ImageDB.created_at, ImageDB.id) < tuple_(*after))
+        db_images = (
+            query
+            .order_by(ImageDB.created_at.desc(), ImageDB.id.desc())
             .limit(limit)
             .all()
         )
@@ -44,4 +69,199 @@ class ImageRepository:
             self.db.commit()
             self.db.refresh(db_image)
             return Image.model_validate(db_image)
-        return None
\ No newline at end of file
+        return None
+
+    def find_derivative(self, content_hash: str, variant_key: str) -> Optional[Image]:
+        """Any finished derivative rendered with `variant_key` from content with `content_hash`."""
+        db_image = (
+            self.db.query(ImageDB)
+            .filter(
+                ImageDB.content_hash == content_hash,
+                ImageDB.variant_key == variant_key,
+                ImageDB.is_transformed.is_(True)
+            )
+            .first()
+        )
+        if db_image:
+            return Image.model_validate(db_image)
+        return None
+
+    def find_derivatives(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Image]:
+        """Batch form of find_derivative: maps each found (content_hash, variant_key) to a finished derivative."""
+        wanted = set(keys)
+        if not wanted:
+            return {}
+        db_images = (
+            self.db.query(ImageDB)
+            .filter(
+                ImageDB.content_hash.in_({content_hash for content_hash, _ in wanted}),
+                ImageDB.variant_key.in_({variant_key for _, variant_key in wanted}),
+                ImageDB.is_transformed.is_(True)
+            )
+            .all()
+        )
+        found: Dict[Tuple[str, str], Image] = {}
+        for db_image in db_images:
+            key = (db_image.content_hash, db_image.variant_key)
+            if key in wanted and key not in found:
+                found[key] = Image.model_validate(db_image)
+        return found
+
+    # --- Content-addressed blobs ---
+
+    def acquire_blob(self, content_hash: str) -> Optional[str]:
+        """
+        Takes a reference on the stored blob with `content_hash`, if there is one.
+        Returns its storage_url, or None when the content has never been stored.
+        """
+        updated = (
+            self.db.query(BlobDB)
+            .filter(BlobDB.content_hash == content_hash)
+            .update({BlobDB.ref_count: BlobDB.ref_count + 1}, synchronize_session=False)
+        )
+        if not updated:
+            self.db.rollback()
+            return None
+        self.db.commit()
+        return self.db.query(BlobDB.storage_url).filter(BlobDB.content_hash == content_hash).scalar()
+
+    def register_blob(self, content_hash: str, storage_url: str, size_bytes: int) -> str:
+        """
+        Records a newly stored blob with one reference. If a concurrent upload of the same
+        content registered first, takes a reference on that one and returns its storage_url.
+        """
+        self.db.add(BlobDB(content_hash=content_hash, storage_url=storage_url, size_bytes=size_bytes, ref_count=1))
+        try:
+            self.db.commit()
+            return storage_url
+        except IntegrityError:
+            self.db.rollback()
+            return self.acquire_blob(content_hash) or storage_url
+
+    def release_blob(self, content_hash: str) -> None:
+        """Drops a reference taken by acquire_blob/register_blob (e.g. when the image row could not be saved)."""
+        self.db.query(BlobDB).filter(BlobDB.content_hash == content_hash).update(
+            {BlobDB.ref_count: BlobDB.ref_count - 1}, synchronize_session=False
+        )
+        self.db.commit()
+
+
+class AsyncImageRepository:
+    """
+    Async variant of ImageRepository for the API: same queries, awaited on an
+    AsyncSession. The worker keeps using the synchronous repository.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_image_by_id(self, image_id: str) -> Optional[Image]:
+        db_image = await self.db.get(ImageDB, image_id)
+        if db_image:
+            return Image.model_validate(db_image)
+        return None
+
+    async def release(self) -> None:
+        """Ends the read transaction, returning the connection to the pool (e.g. before a long wait)."""
+        await self.db.rollback()
+
+    async def create_image(self, image_data: Dict[str, Any]) -> Image:
+        db_image = ImageDB(**image_data)
+        self.db.add(db_image)
+        await self.db.commit()
+        return Image.model_validate(db_image)
+
+    async def get_images_by_ids(self, image_ids: List[str], user_id: int) -> List[Image]:
+        """Fetches the given images owned by `user_id` in a single query; missing or foreign ids are omitted."""
+        if not image_ids:
+            return []
+        result = await self.db.scalars(
+            select(ImageDB).where(ImageDB.id.in_(set(image_ids)), ImageDB.user_id == user_id)
+        )
+        return [Image.model_validate(img) for img in result]
+
+    async def bulk_create_images(self, images_data: List[Dict[str, Any]]) -> None:
+        """Inserts many image rows in one transaction."""
+        if not images_data:
+            return
+        self.db.add_all([ImageDB(**data) for data in images_data])
+        await self.db.commit()
+
+    async def list_images_by_user(self, user_id: int, limit: int, after: Optional[Tuple[datetime, str]] = None) -> List[Image]:
+        """A user's images, newest first, starting after the (created_at, id) key `after` (see ImageRepository)."""
+        query = select(ImageDB).where(ImageDB.user_id == user_id)
+        if after is not None:
+            query = query.where(tuple_(ImageDB.created_at, ImageDB.id) < tuple_(*after))
+        result = await self.db.scalars(
+            query.order_by(ImageDB.created_at.desc(), ImageDB.id.desc()).limit(limit)
+        )
+        return [Image.model_validate(img) for img in result]
+
+    async def find_derivative(self, content_hash: str, variant_key: str) -> Optional[Image]:
+        """Any finished derivative rendered with `variant_key` from content with `content_hash`."""
+        db_image = await self.db.scalar(
+            select(ImageDB)
+            .where(
+                ImageDB.content_hash == content_hash,
+                ImageDB.variant_key == variant_key,
+                ImageDB.is_transformed.is_(True)
+            )
+            .limit(1)
+        )
+        if db_image:
+            return Image.model_validate(db_image)
+        return None
+
+    async def find_derivatives(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Image]:
+        """Batch form of find_derivative: maps each found (content_hash, variant_key) to a finished derivative."""
+        wanted = set(keys)
+        if not wanted:
+            return {}
+        result = await self.db.scalars(
+            select(ImageDB).where(
+                ImageDB.content_hash.in_({content_hash for content_hash, _ in wanted}),
+                ImageDB.variant_key.in_({variant_key for _, variant_key in wanted}),
+                ImageDB.is_transformed.is_(True)
+            )
+        )
+        found: Dict[Tuple[str, str], Image] = {}
+        for db_image in result:
+            key = (db_image.content_hash, db_image.variant_key)
+            if key in wanted and key not in found:
+                found[key] = Image.model_validate(db_image)
+        return found
+
+    # --- Content-addressed blobs ---
+
+    async def acquire_blob(self, content_hash: str) -> Optional[str]:
+        """Takes a reference on the stored blob with `content_hash`; returns its storage_url or None."""
+        result = await self.db.execute(
+            update(BlobDB)
+            .where(BlobDB.content_hash == content_hash)
+            .values(ref_count=BlobDB.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            await self.db.rollback()
+            return None
+        await self.db.commit()
+        return await self.db.scalar(select(BlobDB.storage_url).where(BlobDB.content_hash == content_hash))
+
+    async def register_blob(self, content_hash: str, storage_url: str, size_bytes: int) -> str:
+        """Records a newly stored blob with one reference, or references the one a concurrent upload registered."""
+        self.db.add(BlobDB(content_hash=content_hash, storage_url=storage_url, size_bytes=size_bytes, ref_count=1))
+        try:
+            await self.db.commit()
+            return storage_url
+        except IntegrityError:
+            await self.db.rollback()
+            return await self.acquire_blob(content_hash) or storage_url
+
+    async def release_blob(self, content_hash: str) -> None:
+        """Drops a reference taken by acquire_blob/register_blob (e.g. when the image row could not be saved)."""
+        await self.db.execute(
+            update(BlobDB)
+            .where(BlobDB.content_hash == content_hash)
+            .values(ref_count=BlobDB.ref_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
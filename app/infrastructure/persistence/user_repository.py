@@ -1,6 +1,8 @@
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.infrastructure.database.models import UserDB
-from app.domain.entities.user import UserCreate, User
+from app.domain.entities.user import UserCreate, User, UserInDB
 from typing import Optional # NEW: Import Optional
 
 class UserRepository:
@@ -14,9 +16,69 @@ class UserRepository:
             return User.model_validate(db_user)
         return None
 
+    def get_user_in_db(self, username: str) -> Optional[UserInDB]:
+        """The user including the password hash, for verifying credentials."""
+        db_user = self.db.query(UserDB).filter(UserDB.username == username).first()
+        if db_user:
+            return UserInDB.model_validate(db_user)
+        return None
+
+    def update_password_hash(self, user_id: int, hashed_password: str) -> None:
+        self.db.query(UserDB).filter(UserDB.id == user_id).update({"hashed_password": hashed_password})
+        self.db.commit()
+
+    def get_user_by_id(self, user_id: int) -> Optional[User]:
+        db_user = self.db.get(UserDB, user_id)
+        if db_user:
+            return User.model_validate(db_user)
+        return None
+
+    def set_active(self, user_id: int, is_active: bool) -> None:
+        self.db.query(UserDB).filter(UserDB.id == user_id).update({"is_active": is_active})
+        self.db.commit()
+
     def create_user(self, username: str, hashed_password: str) -> User:
         db_user = UserDB(username=username, hashed_password=hashed_password)
         self.db.add(db_user)
         self.db.commit()
         self.db.refresh(db_user)
-        return User.model_validate(db_user)
\ No newline at end of file
+        return User.model_validate(db_user)
+
+
+class AsyncUserRepository:
+    """Async variant of UserRepository for the API."""
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        db_user = await self.db.scalar(select(UserDB).where(UserDB.username == username))
+        if db_user:
+            return User.model_validate(db_user)
+        return None
+
+    async def get_user_in_db(self, username: str) -> Optional[UserInDB]:
+        """The user including the password hash, for verifying credentials."""
+        db_user = await self.db.scalar(select(UserDB).where(UserDB.username == username))
+        if db_user:
+            return UserInDB.model_validate(db_user)
+        return None
+
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        db_user = await self.db.get(UserDB, user_id)
+        if db_user:
+            return User.model_validate(db_user)
+        return None
+
+    async def update_password_hash(self, user_id: int, hashed_password: str) -> None:
+        await self.db.execute(update(UserDB).where(UserDB.id == user_id).values(hashed_password=hashed_password))
+        await self.db.commit()
+
+    async def set_active(self, user_id: int, is_active: bool) -> None:
+        await self.db.execute(update(UserDB).where(UserDB.id == user_id).values(is_active=is_active))
+        await self.db.commit()
+
+    async def create_user(self, username: str, hashed_password: str) -> User:
+        db_user = UserDB(username=username, hashed_password=hashed_password)
+        self.db.add(db_user)
+        await self.db.commit()
+        return User.model_validate(db_user)
@@ -1,17 +1,37 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.api.v1.endpoints import auth, images
 from app.core.config import settings
+from app.core.loop_monitor import EventLoopMonitor
 from app.core.middlewares import RateLimiterMiddleware
+from app.infrastructure.adapters.registry import AdapterRegistry
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    # Build the GCS, Kafka and Redis adapters once per process instead of once per request
+    adapters = AdapterRegistry()
+    await adapters.start()
+    application.state.adapters = adapters
+    # Flags (with a stack trace) any blocking call that stalls the event loop
+    loop_monitor = EventLoopMonitor(settings.EVENT_LOOP_LAG_THRESHOLD_MS, settings.EVENT_LOOP_MONITOR_INTERVAL_MS)
+    await loop_monitor.start()
+    application.state.loop_monitor = loop_monitor
+    try:
+        yield
+    finally:
+        await loop_monitor.stop()
+        await adapters.close()
 
 def get_application() -> FastAPI:
     application = FastAPI(
         title = settings.PROJECT_NAME,
         version = "0.1.0",
-        docs_url = "/docs"
+        docs_url = "/docs",
+        lifespan = lifespan
     )
 
-    # Note: RateLimiterMiddleware should typically be imported and instantiated 
-    # from starlette.middleware.base or similar, depending on its implementation.
+    # Pure ASGI middleware: token buckets in Redis, shared by every worker and replica
     application.add_middleware(RateLimiterMiddleware)
 
     application.include_router(
@@ -26,6 +46,17 @@ def get_application() -> FastAPI:
         tags = ["Image Management"]
     )
 
+    @application.get("/health", tags = ["Health"])
+    def health(request: Request):
+        """Reports the last known health of the shared adapters, the load on the bounded executors and event loop stalls."""
+        adapters: AdapterRegistry = request.app.state.adapters
+        status_code = 200 if adapters.is_healthy() else 503
+        return JSONResponse({
+            "adapters": adapters.health(),
+            "executors": adapters.executor_stats(),
+            "event_loop": request.app.state.loop_monitor.stats()
+        }, status_code = status_code)
+
     return application
 
 app = get_application()
\ No newline at end of file
@@ -1,10 +1,11 @@
 import os
 import shutil
+from app.core.config import settings
 from app.core.database import engine, Base
 from app.infrastructure.database import models 
 
-# Set up storage directory
-STORAGE_DIR = "images_store"
+# Set up storage directory (used by the "local" storage backend)
+STORAGE_DIR = settings.STORAGE_PATH
 if os.path.exists(STORAGE_DIR):
     shutil.rmtree(STORAGE_DIR)
 os.makedirs(STORAGE_DIR)
@@ -13,4 +14,4 @@ os.makedirs(STORAGE_DIR)
 print("Creating database tables and cleaning storage directory...")
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
-print("Database setup complete. Storage directory created at './images_store'.")
+print(f"Database setup complete. Storage directory created at './{STORAGE_DIR}'.")
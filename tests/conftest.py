@@ -0,0 +1,4 @@
+import os
+
+# app.core.database builds its engines at import time; keep the tests off the default Postgres URL
+os.environ.setdefault("DATABASE_URL", "sqlite://")
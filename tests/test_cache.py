@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from app.core.cache import AsyncSingleFlight
+
+
+def test_single_flight_survives_leader_cancellation():
+    async def scenario():
+        flights = AsyncSingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return 42
+
+        leader = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == 42
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert runs == [1]
+        assert flights._flights == {}
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_shares_errors_and_forgets_the_key():
+    async def scenario():
+        flights = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flights.do("key", work), flights.do("key", work), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+        assert flights._flights == {}
+
+    asyncio.run(scenario())
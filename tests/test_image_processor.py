@@ -0,0 +1,55 @@
+import io
+import pytest
+from PIL import Image as PILImage
+from app.domain.entities.image import Transformation
+from app.infrastructure.adapters.image_processor import ImageProcessorAdapter
+
+
+def _png_16bit(width: int = 1200, height: int = 800) -> bytes:
+    gradient = PILImage.linear_gradient("L").resize((width, height)).convert("I")
+    image = gradient.point(lambda value: value * 256).convert("I;16")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# Shrinking by more than REDUCING_GAP goes through Image.reduce(), which rejects 16-bit modes
+@pytest.mark.parametrize("output_format", ["JPEG", "PNG", "WEBP"])
+@pytest.mark.parametrize("transformation", [
+    {"resize": {"width": 100}},
+    {"rotate": 90, "resize": {"width": 80, "height": 60}, "crop": {"x": 10, "y": 10, "width": 40}},
+    {"rotate": 30, "resize": {"width": 80}},
+    {},
+])
+def test_16bit_png_source_renders(output_format, transformation):
+    source = _png_16bit()
+    assert PILImage.open(io.BytesIO(source)).mode == "I;16"
+
+    output = ImageProcessorAdapter().process_image(source, Transformation(format=output_format, **transformation))
+
+    rendered = PILImage.open(io.BytesIO(output))
+    assert rendered.format == output_format
+    assert rendered.mode == "RGB"
+
+
+def test_16bit_png_source_renders_variant_ladder():
+    outputs = ImageProcessorAdapter().process_variants(
+        _png_16bit(), [Transformation(resize={"width": width}) for width in (300, 75)]
+    )
+
+    assert [PILImage.open(io.BytesIO(output)).size for output in outputs] == [(300, 200), (75, 50)]
+
+
+def test_unknown_output_format_is_rejected():
+    with pytest.raises(ValueError):
+        Transformation(format="bmp")
+
+    unchecked = Transformation.model_construct(format="FOO")
+    with pytest.raises(ValueError):
+        ImageProcessorAdapter().process_image(_png_16bit(40, 30), unchecked)
+
+
+def test_output_format_aliases_and_auto_are_accepted():
+    assert Transformation(format="jpg").format == "JPEG"
+    assert Transformation(format="auto").format == "AUTO"
+    assert Transformation(format="gif").format == "GIF"
@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+import base64
+import pytest
+from app.application.services.image_service import decode_cursor, encode_cursor
+from app.core.exceptions import InvalidCursorError
+from app.domain.entities.image import Image
+
+
+def _image(image_id: str, created_at: datetime) -> Image:
+    return Image(
+        id=image_id, user_id=1, filename="a.jpg", storage_url="1/a.jpg", mimetype="image/jpeg",
+        size_bytes=1, created_at=created_at
+    )
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2024, 5, 17, 8, 30, 12, 123456),
+    datetime(2024, 5, 17, 8, 30, tzinfo=timezone.utc),
+])
+def test_cursor_round_trips_the_keyset(created_at):
+    cursor = encode_cursor(_image("e4f8d689-0000", created_at))
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, "e4f8d689-0000")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"not json").decode("ascii"),
+    base64.urlsafe_b64encode(b'{"created_at": 1}').decode("ascii"),
+    base64.urlsafe_b64encode(b'["yesterday", "id"]').decode("ascii"),
+    base64.urlsafe_b64encode(b'["2024-05-17T08:30:00"]').decode("ascii"),
+])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(InvalidCursorError) as excinfo:
+        decode_cursor(cursor)
+
+    assert excinfo.value.status_code == 400
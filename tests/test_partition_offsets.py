@@ -0,0 +1,43 @@
+from worker.consumer import PartitionOffsets
+
+
+def test_nothing_to_commit_until_the_first_offset_finishes():
+    offsets = PartitionOffsets()
+    for offset in (10, 11, 12):
+        offsets.start(offset)
+
+    assert offsets.committable() is None
+    offsets.finish(11)
+    offsets.finish(12)
+    assert offsets.committable() is None
+
+
+def test_commits_only_the_contiguous_finished_prefix():
+    offsets = PartitionOffsets()
+    for offset in (10, 11, 12, 13):
+        offsets.start(offset)
+
+    offsets.finish(10)
+    offsets.finish(12)
+    assert offsets.committable() == 11
+    # Still held back by 11
+    assert offsets.committable() is None
+
+    offsets.finish(11)
+    assert offsets.committable() == 13
+    offsets.finish(13)
+    assert offsets.committable() == 14
+    assert offsets.committable() is None
+
+
+def test_offsets_need_not_be_consecutive():
+    # Compacted topics and transaction markers leave gaps between offsets
+    offsets = PartitionOffsets()
+    for offset in (5, 9, 20):
+        offsets.start(offset)
+
+    offsets.finish(9)
+    offsets.finish(5)
+    assert offsets.committable() == 10
+    offsets.finish(20)
+    assert offsets.committable() == 21
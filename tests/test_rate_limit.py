@@ -0,0 +1,65 @@
+import pytest
+from app.core import middlewares
+from app.core.config import settings
+from app.core.middlewares import LocalTokenBuckets, parse_rate_limit, route_cost
+
+API = settings.API_V1_STR
+
+
+@pytest.mark.parametrize("method, path, cost", [
+    ("GET", "/health", 0),
+    ("GET", f"{API}/images/files/1/abc.jpg", 0),
+    ("POST", f"{API}/images/", 5),
+    ("POST", f"{API}/images", 5),
+    ("POST", f"{API}/images/transform/batch", 10),
+    ("POST", f"{API}/images/abc/transform", 2),
+    ("GET", f"{API}/images/abc/render", 2),
+    ("GET", f"{API}/images/abc", 1),
+    ("GET", f"{API}/images/", 1),
+    ("DELETE", f"{API}/images/abc/transform", 1),
+])
+def test_route_cost(method, path, cost):
+    assert route_cost(method, path) == cost
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("10/minute", (10, 60)),
+    ("5/second", (5, 1)),
+    ("100/hours", (100, 3600)),
+    ("10/30s", (10, 30)),
+])
+def test_parse_rate_limit(value, expected):
+    assert parse_rate_limit(value) == expected
+
+
+def test_local_buckets_spend_cost_and_refill(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(middlewares.time, "monotonic", lambda: now[0])
+    buckets = LocalTokenBuckets(max_clients=10)
+
+    # Capacity 10, one token per second
+    assert buckets.consume("client", 10, 1.0, 5) == (True, 5, 0.0)
+    assert buckets.consume("client", 10, 1.0, 5) == (True, 0, 0.0)
+    allowed, tokens, retry_after = buckets.consume("client", 10, 1.0, 2)
+    assert not allowed and tokens == 0 and retry_after == 2.0
+
+    now[0] += 2
+    assert buckets.consume("client", 10, 1.0, 2) == (True, 0, 0.0)
+
+    # Refill stops at capacity
+    now[0] += 3600
+    assert buckets.consume("client", 10, 1.0, 1) == (True, 9, 0.0)
+
+
+def test_local_buckets_evict_least_recently_seen(monkeypatch):
+    monkeypatch.setattr(middlewares.time, "monotonic", lambda: 0.0)
+    buckets = LocalTokenBuckets(max_clients=2)
+
+    buckets.consume("a", 1, 1.0, 1)
+    buckets.consume("b", 1, 1.0, 1)
+    buckets.consume("a", 1, 1.0, 0)
+    buckets.consume("c", 1, 1.0, 1)
+
+    # "b" was evicted, so it starts again from a full bucket; "a" is still empty
+    assert buckets.consume("b", 1, 1.0, 1)[0]
+    assert not buckets.consume("c", 1, 1.0, 1)[0]
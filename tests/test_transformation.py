@@ -0,0 +1,64 @@
+import pytest
+from app.domain.entities.image import PRESET_QUALITIES, Transformation
+
+
+@pytest.mark.parametrize("preset", [None, "fast", "balanced", "smallest"])
+@pytest.mark.parametrize("output_format", ["JPEG", "WEBP", "AVIF"])
+def test_preset_default_quality_is_not_part_of_the_fingerprint(preset, output_format):
+    default = PRESET_QUALITIES[preset or "balanced"][output_format]
+    implicit = Transformation(format=output_format, preset=preset)
+    explicit = Transformation(format=output_format, preset=preset, compress_quality=default)
+
+    assert "compress_quality" not in explicit.canonical()
+    assert explicit.fingerprint() == implicit.fingerprint()
+    assert Transformation(format=output_format, preset=preset, compress_quality=default - 1).fingerprint() != implicit.fingerprint()
+
+
+def test_quality_default_depends_on_the_preset():
+    # 70 is the "smallest" JPEG default but not the "balanced" one
+    assert Transformation(compress_quality=70, preset="smallest").fingerprint() == Transformation(preset="smallest").fingerprint()
+    assert Transformation(compress_quality=70).fingerprint() != Transformation().fingerprint()
+
+
+@pytest.mark.parametrize("first, second", [
+    # Key order, in the payload and inside nested dicts
+    ({"resize": {"width": 100, "height": 50}, "format": "png"}, {"format": "png", "resize": {"height": 50, "width": 100}}),
+    ({"crop": {"x": 5, "y": 10, "width": 20}}, {"crop": {"width": 20, "y": 10, "x": 5}}),
+    # Fields at their default value
+    ({}, {"rotate": 0, "flip": False, "mirror": False, "filters": {"grayscale": False}}),
+    ({}, {"format": "jpeg", "preset": "balanced", "resize": {}, "crop": {"x": 0, "y": 0}}),
+    ({"rotate": 90}, {"rotate": 450}),
+    ({"resize": {"width": 100}}, {"resize": {"width": 100, "height": 0}}),
+    ({"format": "png"}, {"format": "png", "compress_quality": 40}),
+    # Format aliases and spelling
+    ({"format": "jpg"}, {"format": "JPEG"}),
+    ({"format": " webp "}, {"format": "WebP"}),
+])
+def test_equivalent_transformations_share_a_fingerprint(first, second):
+    assert Transformation(**first).canonical() == Transformation(**second).canonical()
+    assert Transformation(**first).fingerprint() == Transformation(**second).fingerprint()
+    assert Transformation(**first).get_hash_id("original") == Transformation(**second).get_hash_id("original")
+
+
+@pytest.mark.parametrize("first, second", [
+    ({"resize": {"width": 100}}, {"resize": {"height": 100}}),
+    ({"rotate": 90}, {"rotate": 270}),
+    ({"format": "png"}, {"format": "webp"}),
+    ({"preset": "fast"}, {"preset": "smallest"}),
+    ({"filters": {"grayscale": True}}, {}),
+])
+def test_different_transformations_have_different_fingerprints(first, second):
+    assert Transformation(**first).fingerprint() != Transformation(**second).fingerprint()
+
+
+def test_canonical_form_is_a_valid_payload():
+    transformation = Transformation(
+        resize={"width": 100}, crop={"width": 40}, rotate=-90, format="jpg", compress_quality=60, filters={"sepia": True}
+    )
+    canonical = transformation.canonical()
+
+    assert Transformation(**canonical).canonical() == canonical
+    assert canonical == {
+        "resize": {"width": 100}, "crop": {"x": 0, "y": 0, "width": 40}, "rotate": 270,
+        "format": "JPEG", "compress_quality": 60, "preset": "balanced", "filters": {"sepia": True},
+    }
@@ -0,0 +1,405 @@
+"""
+Transformation Worker Service.
+
+Consumes messages from the transformation topic in batches. Jobs for the same
+original are handled together: the original is downloaded and decoded once, every
+requested variant is rendered from it in a pool of worker processes, and the
+results are uploaded concurrently and written back to the database.
+
+Run with:
+    python -m worker.consumer [--concurrency N] [--max-in-flight N]
+"""
+import argparse
+import json
+import os
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Tuple
+
+from kafka import KafkaConsumer, ConsumerRebalanceListener, OffsetAndMetadata, TopicPartition
+from PIL import UnidentifiedImageError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.domain.entities.image import Image, Transformation, reused_render_columns
+from app.infrastructure.adapters.image_processor import ImageProcessorAdapter, probe_image
+from app.infrastructure.adapters.job_status import JobLeases, JobStatusPublisher, PROCESSING, DONE, FAILED
+from app.infrastructure.adapters.parallel_processor import ParallelImageProcessor
+from app.infrastructure.adapters.redis_adapter import RedisAdapter
+from app.infrastructure.adapters.registry import create_storage_service
+from app.infrastructure.persistence.image_repository import ImageRepository
+
+
+# Job errors that retrying cannot fix: missing rows or objects, invalid parameters, files that are not images
+PERMANENT_ERRORS = (LookupError, FileNotFoundError, ValueError, UnidentifiedImageError)
+
+
+class PartitionOffsets:
+    """
+    Tracks the offsets handed out for a single partition.
+
+    Jobs finish out of order, so only the contiguous prefix of finished offsets
+    may be committed; a slow job holds back the commit of everything after it.
+    """
+    def __init__(self):
+        self._pending = deque()
+        self._done = set()
+
+    def start(self, offset: int) -> None:
+        self._pending.append(offset)
+
+    def finish(self, offset: int) -> None:
+        self._done.add(offset)
+
+    def committable(self) -> Optional[int]:
+        """Returns the next offset to commit, or None if nothing new has finished."""
+        last = None
+        while self._pending and self._pending[0] in self._done:
+            last = self._pending.popleft()
+            self._done.discard(last)
+        return None if last is None else last + 1
+
+
+class _RebalanceListener(ConsumerRebalanceListener):
+    def __init__(self, worker: "TransformationWorker"):
+        self.worker = worker
+
+    def on_partitions_revoked(self, revoked):
+        # Finish what we already started and commit it before losing ownership
+        self.worker.drain()
+        for tp in revoked:
+            self.worker.offsets.pop(tp, None)
+
+    def on_partitions_assigned(self, assigned):
+        for tp in assigned:
+            self.worker.offsets[tp] = PartitionOffsets()
+
+
+class TransformationWorker:
+    """
+    Drains the transformation topic in parallel.
+
+    The main thread polls Kafka in batches and owns all offset bookkeeping. The jobs
+    of a batch are grouped by original image; each group is handled by an I/O thread
+    (one download, uploads, DB updates) which hands the CPU-bound Pillow work for all
+    of its variants to a process pool in one call, so rendering uses every core.
+    """
+    def __init__(self, concurrency: int, max_in_flight: int):
+        self.concurrency = concurrency
+        self.max_in_flight = max_in_flight
+        self.storage = create_storage_service()
+        # Job states for clients waiting on a derivative (GET /images/{id}/status and /events)
+        self.redis = RedisAdapter()
+        self.job_status = JobStatusPublisher(self.redis)
+        # In-flight leases taken by the API; released here so the derivative can be requested again
+        self.leases = JobLeases(self.redis)
+
+        # Pillow processes; images travel through shared memory and the decoded pixels
+        # in progress are capped by WORKER_MEMORY_BUDGET_BYTES
+        self.processor = ParallelImageProcessor(concurrency, settings.WORKER_MEMORY_BUDGET_BYTES)
+        # Plans output sizes from the originals' recorded dimensions, in this process
+        self.planner = ImageProcessorAdapter()
+        self.io_pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="transform-io")
+        # Uploads of a group's variants run side by side
+        self.upload_pool = ThreadPoolExecutor(max_workers=settings.WORKER_UPLOAD_CONCURRENCY, thread_name_prefix="transform-upload")
+
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split(','),
+            group_id=settings.KAFKA_CONSUMER_GROUP,
+            value_deserializer=lambda v: json.loads(v.decode('utf-8')),
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+        )
+        self.consumer.subscribe([settings.KAFKA_TRANSFORMATION_TOPIC], listener=_RebalanceListener(self))
+
+        self.offsets: Dict[TopicPartition, PartitionOffsets] = {}
+        # Each future handles one group of messages; offsets are finished when it completes
+        self.in_flight: Dict[Future, List[Tuple[TopicPartition, int]]] = {}
+        self.in_flight_messages = 0
+        self._running = True
+
+    def stop(self, *_):
+        print("Worker: shutdown requested, draining in-flight jobs...")
+        self._running = False
+
+    # --- Main loop ---
+
+    def run(self) -> None:
+        print(
+            f"Worker: consuming '{settings.KAFKA_TRANSFORMATION_TOPIC}' with "
+            f"{self.concurrency} processes, {self.max_in_flight} jobs in flight."
+        )
+        try:
+            while self._running:
+                self._reap(timeout=0)
+                self._commit()
+
+                free = self.max_in_flight - self.in_flight_messages
+                if free <= 0:
+                    # Bounded in-flight: stop fetching until a job completes
+                    self._reap(timeout=1.0)
+                    continue
+
+                records = self._poll(free)
+                if records:
+                    self._dispatch(records)
+        finally:
+            self.drain()
+            self.consumer.close(autocommit=False)
+            self.io_pool.shutdown(wait=True)
+            self.upload_pool.shutdown(wait=True)
+            self.processor.shutdown(wait=True)
+            self.redis.close()
+            print("Worker: stopped.")
+
+    def _poll(self, max_records: int) -> List[Tuple[TopicPartition, Any]]:
+        """
+        Up to `max_records` messages. Variants of one upload are requested within moments
+        of each other, so after a non-empty poll we linger briefly for the rest of them.
+        """
+        records = []
+        timeout_ms = 500
+        while len(records) < max_records:
+            batch = self.consumer.poll(timeout_ms=timeout_ms, max_records=max_records - len(records))
+            if not batch:
+                break
+            for tp, partition_records in batch.items():
+                records.extend((tp, record) for record in partition_records)
+            timeout_ms = settings.WORKER_BATCH_LINGER_MS
+            if not timeout_ms:
+                break
+        return records
+
+    def _dispatch(self, records: List[Tuple[TopicPartition, Any]]) -> None:
+        """Groups the polled jobs by original image and hands each group to an I/O thread."""
+        groups: Dict[Tuple[str, Any], List[Dict[str, Any]]] = {}
+        group_offsets: Dict[Tuple[str, Any], List[Tuple[TopicPartition, int]]] = {}
+        for tp, record in records:
+            tracker = self.offsets.setdefault(tp, PartitionOffsets())
+            tracker.start(record.offset)
+
+            messages = self._jobs(record.value)
+            if not messages:
+                # e.g. the producer's connectivity "System check" message
+                tracker.finish(record.offset)
+                continue
+
+            key = (messages[0]["original_id"], messages[0]["user_id"])
+            groups.setdefault(key, []).extend(messages)
+            group_offsets.setdefault(key, []).append((tp, record.offset))
+
+        for key, messages in groups.items():
+            future = self.io_pool.submit(self._handle_group, messages)
+            self.in_flight[future] = group_offsets[key]
+            self.in_flight_messages += len(group_offsets[key])
+
+    @staticmethod
+    def _jobs(message: Any) -> List[Dict[str, Any]]:
+        """The jobs in a message: one, or one per variant of a ladder (see send_variant_ladder)."""
+        if not isinstance(message, dict):
+            return []
+        if "variants" in message:
+            return [
+                {"original_id": message["original_id"], "user_id": message["user_id"], **variant}
+                for variant in message["variants"]
+            ]
+        return [message] if "new_id" in message else []
+
+    def _reap(self, timeout: float) -> None:
+        """Marks finished jobs as done so their offsets become committable."""
+        if not self.in_flight:
+            return
+        done, _ = wait(list(self.in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            offsets = self.in_flight.pop(future)
+            self.in_flight_messages -= len(offsets)
+            for tp, offset in offsets:
+                tracker = self.offsets.get(tp)
+                if tracker is not None:
+                    tracker.finish(offset)
+
+    def _commit(self) -> None:
+        commits = {}
+        for tp, tracker in self.offsets.items():
+            offset = tracker.committable()
+            if offset is not None:
+                commits[tp] = OffsetAndMetadata(offset, "")
+        if commits:
+            try:
+                self.consumer.commit(offsets=commits)
+            except Exception as e:
+                print(f"Worker: offset commit failed: {e}")
+
+    def drain(self) -> None:
+        """Waits for every in-flight job and commits the resulting offsets."""
+        while self.in_flight:
+            self._reap(timeout=None)
+        self._commit()
+
+    # --- Job execution (runs on an I/O thread) ---
+
+    def _handle_group(self, messages: List[Dict[str, Any]]) -> None:
+        """Runs the jobs for one original, retrying those that failed; every job ends done or failed."""
+        pending = {message["new_id"]: message for message in messages}
+        self.job_status.publish_many(list(pending), PROCESSING)
+        try:
+            for attempt in range(1, settings.WORKER_MAX_RETRIES + 1):
+                for new_id in pending:
+                    # Keeps duplicate requests away for as long as we are still working on it
+                    self.leases.extend(new_id)
+                try:
+                    errors = self._transform_group(list(pending.values()))
+                except Exception as e:
+                    # Failed before any variant could be rendered (e.g. the download)
+                    errors = {new_id: e for new_id in pending}
+
+                for new_id, message in list(pending.items()):
+                    error = errors.get(new_id)
+                    if error is None:
+                        print(f"Worker: transformed {message['original_id']} -> {new_id}.")
+                        # Published after the DB update, so a woken client reads the finished row
+                        self.job_status.publish(new_id, DONE)
+                    elif isinstance(error, PERMANENT_ERRORS):
+                        # Missing rows or objects will not appear by retrying, nor will invalid parameters or files become valid
+                        print(f"Worker: dropping job {new_id}: {error}")
+                        self.job_status.publish(new_id, FAILED, str(error))
+                    else:
+                        print(f"Worker: job {new_id} failed (attempt {attempt}/{settings.WORKER_MAX_RETRIES}): {error}")
+                        continue
+                    del pending[new_id]
+
+                if not pending:
+                    return
+                if attempt < settings.WORKER_MAX_RETRIES:
+                    time.sleep(2 ** (attempt - 1))
+            self.job_status.publish_many(list(pending), FAILED, "Transformation failed.")
+        finally:
+            self.leases.release([message["new_id"] for message in messages])
+
+    def _transform_group(self, messages: List[Dict[str, Any]]) -> Dict[str, Exception]:
+        """
+        Renders every job of one original (download and decode once, uploads in parallel).
+        Returns the error of each job that failed; the others are done.
+        Database sessions are only held for the reads and the final updates, never while
+        downloading, rendering or uploading.
+        """
+        original, jobs, errors = self._plan_group(messages)
+        if not jobs:
+            return errors
+
+        image_data = self.storage.download_image(original.storage_url)
+        variants = [Transformation(**(message.get("transformations") or {})) for message in jobs]
+        outputs = self.processor.process_many([(image_data, variants)])[0]
+
+        uploads = {}
+        for message, output in zip(jobs, outputs):
+            if isinstance(output, Exception):
+                errors[message["new_id"]] = output
+            else:
+                uploads[message["new_id"]] = self.upload_pool.submit(self._store, message, original.filename, output)
+
+        updates = {}
+        for new_id, upload in uploads.items():
+            try:
+                updates[new_id] = upload.result()
+            except Exception as e:
+                errors[new_id] = e
+
+        # The DB update is the last step: the offset is committed only after it succeeds
+        db = SessionLocal()
+        try:
+            repo = ImageRepository(db)
+            for new_id, columns in updates.items():
+                if repo.update_image(new_id, columns) is None:
+                    errors[new_id] = LookupError(f"placeholder image {new_id} not found")
+        finally:
+            db.close()
+        return errors
+
+    def _plan_group(self, messages: List[Dict[str, Any]]) -> Tuple[Image, List[Dict[str, Any]], Dict[str, Exception]]:
+        """
+        Reads the original and the placeholders in one short session: returns the original,
+        the jobs that still have to be rendered and the errors of those that cannot be.
+        Jobs whose derivative exists for identical content are completed right here.
+        """
+        original_id = messages[0]["original_id"]
+        user_id = messages[0]["user_id"]
+        errors: Dict[str, Exception] = {}
+
+        db = SessionLocal()
+        try:
+            repo = ImageRepository(db)
+            original = repo.get_image_by_id(original_id)
+            if original is None:
+                raise LookupError(f"original image {original_id} not found")
+
+            placeholders = {image.id: image for image in repo.get_images_by_ids([m["new_id"] for m in messages], user_id)}
+            jobs = []
+            for message in messages:
+                new_id = message["new_id"]
+                placeholder = placeholders.get(new_id)
+                if placeholder is None:
+                    errors[new_id] = LookupError(f"placeholder image {new_id} not found")
+                    continue
+                if placeholder.is_transformed:
+                    # A duplicate of a job that has already been rendered
+                    continue
+
+                # A duplicate of the same content may already have this derivative rendered
+                if placeholder.content_hash and placeholder.variant_key:
+                    shared = repo.find_derivative(placeholder.content_hash, placeholder.variant_key)
+                    if shared:
+                        repo.update_image(new_id, reused_render_columns(shared))
+                        continue
+                jobs.append(message)
+        finally:
+            db.close()
+
+        # With the original's recorded size, impossible crops fail without a download
+        if original.width and original.height:
+            planned = []
+            for message in jobs:
+                transformation = Transformation(**(message.get("transformations") or {}))
+                if self.planner.output_size((original.width, original.height), transformation) == (0, 0):
+                    errors[message["new_id"]] = ValueError("crop box lies outside the image")
+                else:
+                    planned.append(message)
+            jobs = planned
+        return original, jobs, errors
+
+    def _store(self, message: Dict[str, Any], original_filename: str, output: bytes) -> Dict[str, Any]:
+        """Uploads one rendered variant; returns the placeholder's updated columns."""
+        transformations = message.get("transformations") or {}
+        output_format = (transformations.get("format") or "JPEG").lower()
+        filename = f"{os.path.splitext(original_filename)[0]}.{output_format}"
+        storage_url = self.storage.save_transformed_image(
+            output, message["user_id"], filename, message["new_id"],
+            content_type=f"image/{output_format}"
+        )
+        return {
+            "storage_url": storage_url,
+            "mimetype": f"image/{output_format}",
+            "size_bytes": len(output),
+            "is_transformed": True,
+            **probe_image(output),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image transformation worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY,
+                        help="Number of image processing processes.")
+    parser.add_argument("--max-in-flight", type=int, default=settings.WORKER_MAX_IN_FLIGHT,
+                        help="Maximum number of messages being processed at once.")
+    args = parser.parse_args()
+
+    worker = TransformationWorker(concurrency=args.concurrency, max_in_flight=args.max_in_flight)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()